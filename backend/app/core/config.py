@@ -1,19 +1,96 @@
 import os
 from pathlib import Path
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "PO Management System"
     GEMINI_API_KEY: str
     GEMINI_MODEL_NAME: str = "gemini-3-flash-preview"
+
+    # Request hedging: if the primary call hasn't returned by the rolling
+    # latency percentile, send a second request (optionally to a faster
+    # model) and use whichever valid result arrives first
+    GEMINI_HEDGE_ENABLED: bool = False
+    GEMINI_HEDGE_MODEL_NAME: Optional[str] = None  # Defaults to GEMINI_MODEL_NAME
+    GEMINI_HEDGE_PERCENTILE: float = 95.0
+    GEMINI_HEDGE_MIN_SAMPLES: int = 20             # Use the default delay until then
+    GEMINI_HEDGE_DEFAULT_DELAY_S: float = 10.0
+    GEMINI_HEDGE_MIN_DELAY_S: float = 2.0
+    # Tokens a hedge must leave in the rate limiter for regular traffic
+    GEMINI_HEDGE_TOKEN_RESERVE: float = 1.0
+    # Timed hedges are skipped while more than this share of recent requests hedged
+    GEMINI_HEDGE_MAX_RATE: float = 0.1
+
+    # Strip quoted replies, signatures and legal footers before prompting Gemini
+    EMAIL_PREPROCESSING_ENABLED: bool = True
+
     # Allow all origins for local development/mobile testing
     CORS_ORIGINS: list[str] = ["*"]
+    # Responses larger than this (bytes) are gzip-compressed for clients that accept it
+    GZIP_MINIMUM_SIZE: int = 1024
+
+    # Database backend: "supabase" (hosted, default) or "sqlite" (embedded,
+    # single-node / edge deployments; Supabase settings are then unused)
+    DB_BACKEND: Literal["supabase", "sqlite"] = "supabase"
+    SQLITE_PATH: str = "orders.db"
+    SQLITE_READERS: int = 4  # Reader threads, each with a read-only connection
+
+    # Supabase Configuration (required when DB_BACKEND=supabase)
+    NEXT_PUBLIC_SUPABASE_URL: Optional[str] = None
+    SUPABASE_SERVICE_ROLE_KEY: Optional[str] = None
+    # HTTP connection pool for PostgREST queries
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = 20
+    SUPABASE_HTTP_MAX_KEEPALIVE: int = 10
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY_S: float = 60.0
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_HTTP_TIMEOUT_S: float = 10.0
+    SUPABASE_HTTP_CONNECT_TIMEOUT_S: float = 5.0
+    # Connections opened during startup warm-up
+    SUPABASE_HTTP_PREWARM_CONNECTIONS: int = 2
 
-    # Supabase Configuration
-    NEXT_PUBLIC_SUPABASE_URL: str
-    SUPABASE_SERVICE_ROLE_KEY: str
+    # Admission control for /api/orders/parse: instead of queueing behind the
+    # Gemini rate limiter indefinitely, reject with 429/503 + Retry-After when
+    # too many requests are already waiting or the predicted wait is too long
+    PARSE_MAX_QUEUED_WAITERS: int = 10
+    PARSE_MAX_WAIT_S: float = 30.0
+    # Gemini responses at least this large (bytes) are JSON-decoded in a process
+    # pool and validated in batches, so they don't stall the event loop; 0 disables
+    PARSE_LARGE_RESPONSE_BYTES: int = 65536
+    # Decode pool size; 0 (or a single-CPU host) decodes on the event loop thread
+    PARSE_PROCESS_POOL_WORKERS: int = 2
+    # Orders validated between event loop yields
+    PARSE_VALIDATION_BATCH_SIZE: int = 100
+
+    # Delta sync (GET /api/orders/changes)
+    # New cursors point this far back so rows committed slightly out of
+    # timestamp order are re-sent, not missed. Cursors and row timestamps
+    # both come from the database clock, so app/DB clock skew doesn't count
+    SYNC_CURSOR_OVERLAP_S: float = 5.0
+    # Tombstones for deleted orders are kept this long; older cursors get a reset
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # Archival: orders untouched for ARCHIVE_AFTER_DAYS in one of ARCHIVE_STATUSES
+    # are moved to purchase_orders_archive in batches by the maintenance task.
+    # Default queries only read the hot table.
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_STATUSES: list[str] = ["Shipped"]
+    ARCHIVE_BATCH_SIZE: int = 500
+
+    # Background maintenance (tombstone pruning, archival) runs this often
+    MAINTENANCE_INTERVAL_S: float = 3600.0
+
+    # Request Tracing
+    # Requests slower than this are logged with their per-stage breakdown
+    SLOW_REQUEST_THRESHOLD_MS: float = 2000.0
+    # On-demand profiling: both the switch and a token are required.
+    # Send the token in the X-Profile-Token header to profile a single request.
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_INTERVAL_MS: float = 5.0
 
     class Config:
         # Try multiple possible .env locations, but don't fail if none exist
@@ -22,6 +99,15 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
         extra = "ignore"
 
+    @model_validator(mode="after")
+    def check_db_backend(self):
+        # Fail at startup, not on the first query, when Supabase isn't configured
+        if self.DB_BACKEND == "supabase" and not (self.NEXT_PUBLIC_SUPABASE_URL and self.SUPABASE_SERVICE_ROLE_KEY):
+            raise ValueError(
+                "NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are required when DB_BACKEND=supabase"
+            )
+        return self
+
 @lru_cache()
 def get_settings():
     return Settings()
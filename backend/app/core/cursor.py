@@ -0,0 +1,27 @@
+"""
+Sync Cursors
+Opaque position tokens for incremental sync (GET /api/orders/changes).
+
+A cursor wraps a UTC timestamp. Clients must treat it as an opaque string and
+send back exactly what they received; the encoding may change.
+"""
+
+import base64
+from datetime import datetime, timezone
+
+
+def encode_cursor(position: datetime) -> str:
+    raw = position.astimezone(timezone.utc).isoformat().encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> datetime:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = datetime.fromisoformat(raw.decode("ascii"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if position.tzinfo is None:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return position
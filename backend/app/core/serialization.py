@@ -0,0 +1,69 @@
+"""
+Response Serialization
+Content negotiation and compact wire formats for order lists.
+
+Formats (chosen from the Accept header):
+- application/json: list of objects (default)
+- application/vnd.orbital.columnar+json: one array per field, so field names
+  are sent once instead of once per row
+- application/msgpack: the columnar structure as MessagePack (binary, smaller
+  and cheaper to encode/decode than JSON)
+
+Compression above a size threshold is handled by GZipMiddleware in main.py.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+from fastapi import Response
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.orbital.columnar+json"
+MSGPACK = "application/msgpack"
+
+# Accept values mapped to the media type we'll produce
+_OFFERS = {
+    JSON: JSON,
+    COLUMNAR_JSON: COLUMNAR_JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+def negotiate(accept: str) -> str:
+    """Pick the supported media type the client prefers (highest q, then first listed)."""
+    candidates: List[Tuple[float, int, str]] = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_range, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        offer = _OFFERS.get(media_range.lower())
+        if offer and q > 0:
+            candidates.append((-q, position, offer))
+    return min(candidates)[2] if candidates else JSON
+
+
+def to_columns(rows: List[Dict[str, Any]], fields: List[str]) -> Dict[str, Any]:
+    """Transpose row dicts into {"count": n, "columns": {field: [values...]}}."""
+    return {
+        "count": len(rows),
+        "columns": {field: [row[field] for row in rows] for field in fields},
+    }
+
+
+def encode_rows(rows: List[Dict[str, Any]], fields: List[str], media_type: str) -> Response:
+    """Serialize projected rows in the negotiated format."""
+    if media_type == MSGPACK:
+        import msgpack
+        content = msgpack.packb(to_columns(rows, fields), use_bin_type=True)
+    elif media_type == COLUMNAR_JSON:
+        content = json.dumps(to_columns(rows, fields), separators=(",", ":"))
+    else:
+        content = json.dumps(rows, separators=(",", ":"))
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,166 @@
+"""
+Request Tracing
+Lightweight span timing for the request path.
+
+Features:
+- Per-request span collection via contextvars (safe under concurrent requests)
+- `span()` context manager and `traced()` decorator for sync and async code
+- Server-Timing response header with a per-stage latency breakdown
+- Slow-request log for requests above a configurable threshold
+- Opt-in, token-gated sampling profile of a single request
+"""
+
+import asyncio
+import functools
+import hmac
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import get_settings
+from app.core.profiling import SamplingProfiler
+
+# Header carrying the profiling token on requests that should be profiled
+PROFILE_HEADER = "X-Profile-Token"
+
+
+class Trace:
+    """Collects the spans recorded while handling a single request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []  # (name, duration in ms)
+
+    def add(self, name: str, duration_ms: float):
+        self.spans.append((name, duration_ms))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def summary(self) -> Dict[str, Tuple[float, int]]:
+        """Aggregate spans by name into (total duration in ms, call count)."""
+        totals: Dict[str, Tuple[float, int]] = {}
+        for name, duration_ms in self.spans:
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration_ms, count + 1)
+        return totals
+
+    def server_timing(self, total_ms: float) -> str:
+        """Render the spans as a Server-Timing header value."""
+        metrics = []
+        for name, (duration_ms, count) in self.summary().items():
+            metric = f"{name};dur={duration_ms:.1f}"
+            if count > 1:
+                metric += f';desc="x{count}"'
+            metrics.append(metric)
+        metrics.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(metrics)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block of code and record it on the current request's trace.
+    Outside of a request (e.g. CLI scripts) this is a no-op.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, (time.perf_counter() - start) * 1000)
+
+
+def traced(name: str):
+    """Decorator that records every call of the wrapped function as a span."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _profiling_requested(request: Request) -> bool:
+    """Profiling requires the feature switch AND a matching token."""
+    settings = get_settings()
+    if not settings.PROFILING_ENABLED or not settings.PROFILING_TOKEN:
+        return False
+    token = request.headers.get(PROFILE_HEADER)
+    if not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.PROFILING_TOKEN.encode())
+
+
+def _log_slow_request(request: Request, status_code: int, trace: Trace, total_ms: float):
+    breakdown = " ".join(
+        f"{name}={duration_ms:.1f}ms" + (f"(x{count})" if count > 1 else "")
+        for name, (duration_ms, count) in trace.summary().items()
+    )
+    print(
+        f"[slow-request] {request.method} {request.url.path} "
+        f"status={status_code} total={total_ms:.1f}ms {breakdown}"
+    )
+
+
+async def tracing_middleware(request: Request, call_next):
+    """
+    HTTP middleware: opens a trace for the request, attaches the Server-Timing
+    header and logs the breakdown when the request is slow.
+
+    If the request carries a valid profiling token, the endpoint runs under a
+    sampling profiler and the collapsed-stack profile is returned instead of
+    the normal response body (original status in X-Profiled-Status).
+    """
+    settings = get_settings()
+    trace = Trace()
+    token = _current_trace.set(trace)
+
+    profiler = SamplingProfiler(settings.PROFILING_INTERVAL_MS / 1000) if _profiling_requested(request) else None
+    if profiler:
+        profiler.start()
+
+    try:
+        response = await call_next(request)
+        if profiler:
+            # Drain the body so the profile covers the full response generation
+            async for _ in response.body_iterator:
+                pass
+    finally:
+        _current_trace.reset(token)
+        if profiler:
+            profiler.stop()
+
+    total_ms = trace.elapsed_ms()
+    if total_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+        _log_slow_request(request, response.status_code, trace, total_ms)
+
+    headers = {
+        "Server-Timing": trace.server_timing(total_ms),
+        "Timing-Allow-Origin": "*",
+    }
+
+    if profiler:
+        headers["X-Profiled-Status"] = str(response.status_code)
+        return PlainTextResponse(profiler.collapsed(), headers=headers)
+
+    response.headers.update(headers)
+    return response
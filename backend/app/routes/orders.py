@@ -1,26 +1,124 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import List
-from app.schemas import PurchaseOrder, EmailParsingRequest, EmailParsingResponse, OrderStatus
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response
+from datetime import timedelta
+from typing import List, Optional
+from app.core.cursor import decode_cursor, encode_cursor
+from app.core.serialization import JSON, negotiate, encode_rows
+from app.schemas import (
+    ORDER_FIELD_COLUMNS,
+    PurchaseOrder, EmailParsingRequest, EmailParsingResponse, OrderStatus, WriteOutcome,
+    BulkStatusUpdateRequest, BulkStatusUpdateResponse, StatusUpdateResult, OrderChangesResponse,
+)
+from app.core.config import get_settings
+from app.core.tracing import span
 from app.services.db import db
-from app.services.gemini_service import parse_email_with_gemini
+from app.services.email_preprocessor import strip_email_noise
+from app.services.gemini_service import RateLimitExceeded, parse_email_with_gemini
 
 router = APIRouter()
 
 
 @router.get("/orders", response_model=List[PurchaseOrder])
-async def get_orders():
-    return await db.get_all()
+async def get_orders(
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,supplier,status"),
+):
+    """
+    List orders. 'fields' pushes column projection down to the database.
+    Send Accept: application/vnd.orbital.columnar+json or application/msgpack
+    for a compact columnar response.
+    """
+    field_list = None
+    if fields:
+        field_list = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in field_list if f not in ORDER_FIELD_COLUMNS]
+        if unknown or not field_list:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(ORDER_FIELD_COLUMNS)}",
+            )
+
+    media_type = negotiate(request.headers.get("accept", ""))
+    if field_list is None and media_type == JSON:
+        return await db.get_all()
+
+    field_list = field_list or list(ORDER_FIELD_COLUMNS)
+    rows = await db.get_all(fields=field_list)
+    return encode_rows(rows, field_list, media_type)
+
+
+@router.get("/orders/changes", response_model=OrderChangesResponse)
+async def get_order_changes(
+    since: Optional[str] = Query(None, description="Cursor from the previous call; omit for a full snapshot"),
+):
+    """
+    Incremental sync: orders written and PO IDs deleted since the cursor.
+    Without a cursor, or with one older than the tombstone retention window,
+    returns every order with reset=true so the client replaces its copy.
+    Changes near the cursor may be delivered twice; apply them idempotently.
+    """
+    settings = get_settings()
+    # Taken before reading, so anything committed during the read is picked up next time.
+    # Database time, not this server's: row timestamps are set by the database
+    read_at = await db.clock()
+    next_cursor = encode_cursor(read_at - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP_S))
+
+    position = None
+    if since:
+        try:
+            position = decode_cursor(since)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if position is None or position < read_at - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        return OrderChangesResponse(orders=await db.get_all(), cursor=next_cursor, reset=True)
+
+    orders, deleted = await db.get_changes(position)
+    return OrderChangesResponse(orders=orders, deleted=deleted, cursor=next_cursor)
+
+
+@router.get("/orders/search", response_model=List[PurchaseOrder])
+async def search_orders(
+    q: str = Query(..., min_length=1, description="Text to find in the items description"),
+    include_archived: bool = Query(False, description="Also search archived orders"),
+):
+    return await db.search_items(q, include_archived=include_archived)
+
+
+# Declared after the static /orders/... GET routes so it doesn't shadow them
+@router.get("/orders/{po_id}", response_model=PurchaseOrder)
+async def get_order(
+    po_id: str,
+    include_archived: bool = Query(False, description="Fall back to the archive if the order isn't active"),
+):
+    order = await db.get_by_id(po_id, include_archived=include_archived)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
 
 
 @router.post("/orders", response_model=PurchaseOrder)
-async def create_order(order: PurchaseOrder):
-    return await db.add(order)
+async def create_order(order: PurchaseOrder, response: Response):
+    saved, outcome = await db.add(order)
+    # created / updated / unchanged - unchanged means no write was issued
+    response.headers["X-Write-Outcome"] = outcome.value
+    return saved
 
 
 @router.post("/orders/parse", response_model=EmailParsingResponse)
 async def parse_email(request: EmailParsingRequest):
+    settings = get_settings()
     try:
-        parsed_orders, errors = await parse_email_with_gemini(request.email_text)
+        # Strip quoted history, signatures and legal footers to shrink the prompt
+        email_text, bytes_saved = request.email_text, 0
+        if settings.EMAIL_PREPROCESSING_ENABLED:
+            with span("preprocess"):
+                email_text, bytes_saved = strip_email_noise(request.email_text)
+
+        parsed_orders, errors = await parse_email_with_gemini(
+            email_text,
+            max_wait=settings.PARSE_MAX_WAIT_S,
+            max_waiters=settings.PARSE_MAX_QUEUED_WAITERS,
+        )
 
         # If no orders were parsed and we have errors, it's a failure
         if not parsed_orders and errors:
@@ -33,18 +131,65 @@ async def parse_email(request: EmailParsingRequest):
             if existing_order:
                 existing_ids.append(order.id)
 
-        return EmailParsingResponse(parsed_data=parsed_orders, errors=errors, existing_ids=existing_ids)
+        return EmailParsingResponse(
+            parsed_data=parsed_orders,
+            errors=errors,
+            existing_ids=existing_ids,
+            bytes_saved=bytes_saved,
+        )
+    except RateLimitExceeded as e:
+        # Shed load early: a full queue means the server is saturated (503),
+        # a long predicted wait means this client should slow down (429)
+        raise HTTPException(
+            status_code=503 if e.queue_full else 429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.patch("/orders/status", response_model=BulkStatusUpdateResponse)
+async def update_status_many(request: BulkStatusUpdateRequest):
+    """
+    Update the status of many orders at once, either from explicit
+    (po_id, status) pairs or for every order matching a filter.
+    """
+    if request.updates is not None and request.filter is not None:
+        raise HTTPException(status_code=400, detail="Provide either 'updates' or 'filter', not both")
+
+    if request.updates is not None:
+        results = await db.update_status_many([(u.po_id, u.status) for u in request.updates])
+    elif request.filter is not None:
+        if request.status is None:
+            raise HTTPException(status_code=400, detail="'status' is required when using 'filter'")
+        criteria = request.filter
+        if criteria.po_ids is None and criteria.supplier is None and criteria.current_status is None:
+            raise HTTPException(status_code=400, detail="'filter' must set at least one criterion")
+        results = await db.update_status_where(
+            request.status,
+            po_ids=criteria.po_ids,
+            supplier=criteria.supplier,
+            current_status=criteria.current_status,
+        )
+    else:
+        raise HTTPException(status_code=400, detail="Provide either 'updates' or 'filter'")
+
+    return BulkStatusUpdateResponse(
+        results=[StatusUpdateResult(po_id=po_id, outcome=outcome) for po_id, outcome in results],
+        updated_count=sum(1 for _, outcome in results if outcome == WriteOutcome.UPDATED),
+    )
+
+
 @router.patch("/orders/{po_id}/status", response_model=PurchaseOrder)
-async def update_status(po_id: str, status: OrderStatus):
-    updated = await db.update_status(po_id, status)
-    if not updated:
+async def update_status(po_id: str, status: OrderStatus, response: Response):
+    result = await db.update_status(po_id, status)
+    if not result:
         raise HTTPException(status_code=404, detail="Order not found")
+    updated, outcome = result
+    response.headers["X-Write-Outcome"] = outcome.value
     return updated
 
 
@@ -9,6 +9,13 @@ class OrderStatus(str, Enum):
     SHIPPED = "Shipped"
     SHIPMENT_DELAY = "Shipment Delay"
 
+class WriteOutcome(str, Enum):
+    """Result of an upsert or status update for a single order."""
+    CREATED = "created"
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+    NOT_FOUND = "not_found"
+
 class PurchaseOrder(BaseModel):
     id: str = Field(description="The unique PO identifier (e.g., PO-45821)")
     supplier: str = Field(default="Unknown Supplier", description="Name of the supplier")
@@ -18,6 +25,17 @@ class PurchaseOrder(BaseModel):
     last_updated: str = Field(default="Unknown", description="Date of last update (e.g., Jan 2, 2024)")
     additional_context: Optional[str] = Field(None, description="Additional context like delay reasons, date changes, special notes")
 
+# API field name -> purchase_orders column, used for sparse fieldsets (?fields=)
+ORDER_FIELD_COLUMNS = {
+    "id": "po_id",
+    "supplier": "supplier",
+    "items": "items",
+    "expected_date": "expected_date",
+    "status": "status",
+    "last_updated": "updated_at",
+    "additional_context": "additional_context",
+}
+
 class EmailParsingRequest(BaseModel):
     email_text: str
 
@@ -25,3 +43,32 @@ class EmailParsingResponse(BaseModel):
     parsed_data: List[PurchaseOrder]
     errors: List[str] = Field(default_factory=list, description="List of errors for emails that failed to parse")
     existing_ids: List[str] = Field(default_factory=list, description="List of PO IDs that already exist in the database")
+    bytes_saved: int = Field(default=0, description="Bytes of quoted history, signatures and footers stripped before parsing")
+
+class StatusUpdate(BaseModel):
+    po_id: str
+    status: OrderStatus
+
+class StatusFilter(BaseModel):
+    po_ids: Optional[List[str]] = Field(None, description="Restrict to these PO IDs")
+    supplier: Optional[str] = Field(None, description="Restrict to orders from this supplier")
+    current_status: Optional[OrderStatus] = Field(None, description="Restrict to orders currently in this status")
+
+class BulkStatusUpdateRequest(BaseModel):
+    updates: Optional[List[StatusUpdate]] = Field(None, description="Explicit (po_id, status) pairs")
+    filter: Optional[StatusFilter] = Field(None, description="Select orders by filter instead of listing them")
+    status: Optional[OrderStatus] = Field(None, description="Target status for orders matched by the filter")
+
+class StatusUpdateResult(BaseModel):
+    po_id: str
+    outcome: WriteOutcome
+
+class BulkStatusUpdateResponse(BaseModel):
+    results: List[StatusUpdateResult]
+    updated_count: int = Field(description="Number of orders whose status actually changed")
+
+class OrderChangesResponse(BaseModel):
+    orders: List[PurchaseOrder] = Field(description="Orders created or updated since the cursor, oldest first")
+    deleted: List[str] = Field(default_factory=list, description="PO IDs deleted since the cursor")
+    cursor: str = Field(description="Opaque cursor to pass as 'since' on the next call")
+    reset: bool = Field(default=False, description="True when 'orders' is a full snapshot that replaces the client's copy")
@@ -1,13 +1,38 @@
 """
-Database Layer - Supabase Wrapper
+Database Layer - Backend Selection
 Provides the same interface as the original PostgreSQL DB for backward compatibility.
 All methods are async for API consistency.
+
+Backends (Settings.DB_BACKEND):
+- supabase: hosted Supabase over PostgREST (default)
+- sqlite: embedded SQLite file for single-node / edge deployments
 """
 
 from typing import List, Optional
+from app.core.config import Settings, get_settings
 from app.schemas import PurchaseOrder, OrderStatus
-from app.services.db_supabase import db_supabase
 
-# Re-export the Supabase database instance
+# Re-export the selected database instance
 # Routes will use this as: from app.services.db import db
-db = db_supabase
+if get_settings().DB_BACKEND == "sqlite":
+    from app.services.db_sqlite import db_sqlite as db
+else:
+    from app.services.db_supabase import db_supabase as db
+
+
+def configure_db(settings: Settings):
+    """Apply connection settings to the database instance (without connecting)."""
+    if settings.DB_BACKEND == "sqlite":
+        db.configure(path=settings.SQLITE_PATH, readers=settings.SQLITE_READERS)
+        return
+    db.configure(
+        supabase_url=settings.NEXT_PUBLIC_SUPABASE_URL,
+        supabase_key=settings.SUPABASE_SERVICE_ROLE_KEY,
+        max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.SUPABASE_HTTP_KEEPALIVE_EXPIRY_S,
+        http2=settings.SUPABASE_HTTP2,
+        timeout=settings.SUPABASE_HTTP_TIMEOUT_S,
+        connect_timeout=settings.SUPABASE_HTTP_CONNECT_TIMEOUT_S,
+        prewarm_connections=settings.SUPABASE_HTTP_PREWARM_CONNECTIONS,
+    )
@@ -10,9 +10,11 @@ Features:
 """
 
 import asyncpg
-from typing import List, Optional, Tuple
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from contextlib import asynccontextmanager
-from app.schemas import PurchaseOrder, OrderStatus
+from app.schemas import PurchaseOrder, OrderStatus, WriteOutcome, ORDER_FIELD_COLUMNS
+from app.core.tracing import traced
 
 
 class PostgresDB:
@@ -76,8 +78,34 @@ class PostgresDB:
             additional_context=row['additional_context']
         )
     
-    async def get_all(self) -> List[PurchaseOrder]:
-        """Retrieve all purchase orders, ordered by most recent first."""
+    def _row_to_fields(self, row: asyncpg.Record, fields: List[str]) -> Dict[str, Any]:
+        """Convert a projected row to a dict of API fields, formatted like _row_to_order."""
+        result = {}
+        for field in fields:
+            val = row[ORDER_FIELD_COLUMNS[field]]
+            if field == 'expected_date' and val:
+                val = val.strftime("%b %d, %Y") if hasattr(val, 'strftime') else str(val)
+            elif field == 'last_updated':
+                val = val.strftime("%b %d, %Y") if val else "Unknown"
+            result[field] = val
+        return result
+    
+    @traced("db.get_all")
+    async def get_all(self, fields: Optional[List[str]] = None) -> List[Any]:
+        """
+        Retrieve all purchase orders, ordered by most recent first.
+        With 'fields' (API field names), only those columns are selected and
+        plain dicts are returned instead of PurchaseOrder objects.
+        """
+        if fields is not None:
+            columns = ", ".join(ORDER_FIELD_COLUMNS[field] for field in fields)
+            async with self.acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {columns}
+                    FROM purchase_orders
+                    ORDER BY updated_at DESC
+                """)
+                return [self._row_to_fields(row, fields) for row in rows]
         async with self.acquire() as conn:
             rows = await conn.fetch("""
                 SELECT po_id, supplier, items, expected_date, status, 
@@ -87,8 +115,52 @@ class PostgresDB:
             """)
             return [self._row_to_order(row) for row in rows]
     
-    async def get_by_id(self, po_id: str) -> Optional[PurchaseOrder]:
-        """Retrieve a single order by PO ID."""
+    @traced("db.clock")
+    async def clock(self) -> datetime:
+        """Current database time; delta-sync cursors are taken from it."""
+        async with self.acquire() as conn:
+            return await conn.fetchval("SELECT clock_timestamp()")
+    
+    @traced("db.get_changes")
+    async def get_changes(self, since: datetime) -> Tuple[List[PurchaseOrder], List[str]]:
+        """
+        Orders written at or after 'since' (oldest first) and PO IDs deleted
+        since then. Tombstones for PO IDs that exist again are left out.
+        Both reads share one snapshot so a concurrent delete can't appear in both.
+        """
+        async with self.acquire() as conn:
+            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                rows = await conn.fetch("""
+                    SELECT po_id, supplier, items, expected_date, status,
+                           additional_context, created_at, updated_at
+                    FROM purchase_orders
+                    WHERE updated_at >= $1
+                    ORDER BY updated_at
+                """, since)
+                deleted = await conn.fetch("""
+                    SELECT d.po_id
+                    FROM purchase_order_deletions d
+                    WHERE d.deleted_at >= $1
+                      AND NOT EXISTS (SELECT 1 FROM purchase_orders p WHERE p.po_id = d.po_id)
+                    ORDER BY d.deleted_at
+                """, since)
+            return [self._row_to_order(row) for row in rows], [row['po_id'] for row in deleted]
+    
+    async def _fetch_current(self, conn: asyncpg.Connection, po_id: str) -> Optional[asyncpg.Record]:
+        """Read the stored row in its own statement (fresh READ COMMITTED snapshot)."""
+        return await conn.fetchrow("""
+            SELECT po_id, supplier, items, expected_date, status,
+                   additional_context, created_at, updated_at
+            FROM purchase_orders
+            WHERE po_id = $1
+        """, po_id)
+    
+    @traced("db.get_by_id")
+    async def get_by_id(self, po_id: str, include_archived: bool = False) -> Optional[PurchaseOrder]:
+        """
+        Retrieve a single order by PO ID.
+        With include_archived, falls back to the archive when the order isn't hot.
+        """
         async with self.acquire() as conn:
             row = await conn.fetchrow("""
                 SELECT po_id, supplier, items, expected_date, status,
@@ -96,75 +168,299 @@ class PostgresDB:
                 FROM purchase_orders
                 WHERE po_id = $1
             """, po_id)
+            if row is None and include_archived:
+                row = await conn.fetchrow("""
+                    SELECT po_id, supplier, items, expected_date, status,
+                           additional_context, created_at, updated_at
+                    FROM purchase_orders_archive
+                    WHERE po_id = $1
+                """, po_id)
             return self._row_to_order(row) if row else None
     
-    async def add(self, order: PurchaseOrder) -> PurchaseOrder:
+    @traced("db.add")
+    async def add(self, order: PurchaseOrder) -> Tuple[PurchaseOrder, WriteOutcome]:
         """
         Add or update a purchase order (upsert).
-        Uses ON CONFLICT to handle duplicates efficiently.
+        Uses ON CONFLICT to handle duplicates efficiently; the conflict WHERE
+        clause skips the write entirely when the stored row already matches,
+        so re-importing identical data doesn't touch updated_at or the WAL.
+        Returns a tuple of (order, outcome).
+
+        The "nothing written" branch reads the statement's snapshot. When a
+        concurrent writer (e.g. a double-clicked Save) committed the same data
+        while ON CONFLICT waited on its lock, that snapshot has no row or an
+        older one; the stored row is then re-read in a separate statement.
         """
         async with self.acquire() as conn:
-            row = await conn.fetchrow("""
-                INSERT INTO purchase_orders 
-                    (po_id, supplier, items, expected_date, status, additional_context)
-                VALUES ($1, $2, $3, $4, $5::order_status, $6)
-                ON CONFLICT (po_id) DO UPDATE SET
-                    supplier = EXCLUDED.supplier,
-                    items = EXCLUDED.items,
-                    expected_date = EXCLUDED.expected_date,
-                    status = EXCLUDED.status,
-                    additional_context = EXCLUDED.additional_context,
-                    updated_at = NOW()
-                RETURNING po_id, supplier, items, expected_date, status,
-                          additional_context, created_at, updated_at
-            """, 
-                order.id,
-                order.supplier,
-                order.items,
-                order.expected_date,
-                order.status.value,
-                order.additional_context
+            while True:
+                row = await conn.fetchrow("""
+                    WITH upsert AS (
+                        INSERT INTO purchase_orders 
+                            (po_id, supplier, items, expected_date, status, additional_context)
+                        VALUES ($1, $2, $3, $4, $5::order_status, $6)
+                        ON CONFLICT (po_id) DO UPDATE SET
+                            supplier = EXCLUDED.supplier,
+                            items = EXCLUDED.items,
+                            expected_date = EXCLUDED.expected_date,
+                            status = EXCLUDED.status,
+                            additional_context = EXCLUDED.additional_context,
+                            updated_at = NOW()
+                        WHERE (purchase_orders.supplier, purchase_orders.items,
+                               purchase_orders.expected_date, purchase_orders.status,
+                               purchase_orders.additional_context)
+                            IS DISTINCT FROM
+                              (EXCLUDED.supplier, EXCLUDED.items, EXCLUDED.expected_date,
+                               EXCLUDED.status, EXCLUDED.additional_context)
+                        RETURNING po_id, supplier, items, expected_date, status,
+                                  additional_context, created_at, updated_at,
+                                  CASE WHEN xmax = 0 THEN 'created' ELSE 'updated' END AS outcome
+                    )
+                    SELECT * FROM upsert
+                    UNION ALL
+                    -- Nothing written: return the stored row as-is ('stale' if this
+                    -- snapshot predates the concurrent write that made it match)
+                    SELECT po_id, supplier, items, expected_date, status,
+                           additional_context, created_at, updated_at,
+                           CASE WHEN (supplier, items, expected_date, status, additional_context)
+                                     IS NOT DISTINCT FROM ($2, $3, $4, $5::order_status, $6)
+                                THEN 'unchanged' ELSE 'stale' END
+                    FROM purchase_orders
+                    WHERE po_id = $1 AND NOT EXISTS (SELECT 1 FROM upsert)
+                """,
+                    order.id,
+                    order.supplier,
+                    order.items,
+                    order.expected_date,
+                    order.status.value,
+                    order.additional_context
+                )
+                if row is not None and row['outcome'] != 'stale':
+                    return self._row_to_order(row), WriteOutcome(row['outcome'])
+                row = await self._fetch_current(conn, order.id)
+                if row is not None:
+                    return self._row_to_order(row), WriteOutcome.UNCHANGED
+                # Deleted between the two statements: write it again
+    
+    @traced("db.add_many")
+    async def add_many(self, orders: List[PurchaseOrder]) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Upsert many orders in one set-based statement, skipping rows whose
+        content is unchanged. Returns (po_id, outcome) per distinct PO ID,
+        in input order (last duplicate wins).
+        """
+        latest = {order.id: order for order in orders}
+        if not latest:
+            return []
+        rows_in = list(latest.values())
+        async with self.acquire() as conn:
+            rows = await conn.fetch("""
+                WITH input AS (
+                    SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[], $6::text[])
+                        AS u(po_id, supplier, items, expected_date, status, additional_context)
+                ),
+                upsert AS (
+                    INSERT INTO purchase_orders 
+                        (po_id, supplier, items, expected_date, status, additional_context)
+                    SELECT po_id, supplier, items, expected_date, status::order_status, additional_context
+                    FROM input
+                    ON CONFLICT (po_id) DO UPDATE SET
+                        supplier = EXCLUDED.supplier,
+                        items = EXCLUDED.items,
+                        expected_date = EXCLUDED.expected_date,
+                        status = EXCLUDED.status,
+                        additional_context = EXCLUDED.additional_context,
+                        updated_at = NOW()
+                    WHERE (purchase_orders.supplier, purchase_orders.items,
+                           purchase_orders.expected_date, purchase_orders.status,
+                           purchase_orders.additional_context)
+                        IS DISTINCT FROM
+                          (EXCLUDED.supplier, EXCLUDED.items, EXCLUDED.expected_date,
+                           EXCLUDED.status, EXCLUDED.additional_context)
+                    RETURNING po_id, CASE WHEN xmax = 0 THEN 'created' ELSE 'updated' END AS outcome
+                )
+                SELECT i.po_id, COALESCE(u.outcome, 'unchanged') AS outcome
+                FROM input i
+                LEFT JOIN upsert u ON u.po_id = i.po_id
+            """,
+                [o.id for o in rows_in],
+                [o.supplier for o in rows_in],
+                [o.items for o in rows_in],
+                [o.expected_date for o in rows_in],
+                [o.status.value for o in rows_in],
+                [o.additional_context for o in rows_in],
             )
-            return self._row_to_order(row)
+            outcomes = {row['po_id']: WriteOutcome(row['outcome']) for row in rows}
+            return [(po_id, outcomes[po_id]) for po_id in latest]
     
-    async def update_status(self, po_id: str, status: OrderStatus) -> Optional[PurchaseOrder]:
-        """Update the status of an existing order."""
+    @traced("db.update_status")
+    async def update_status(self, po_id: str, status: OrderStatus) -> Optional[Tuple[PurchaseOrder, WriteOutcome]]:
+        """
+        Update the status of an existing order.
+        Skips the UPDATE when the order already has this status.
+        Returns (order, outcome), or None if the order doesn't exist.
+        As in add(), a fallback row from a snapshot older than a concurrent
+        write is re-read in a separate statement.
+        """
         async with self.acquire() as conn:
             row = await conn.fetchrow("""
-                UPDATE purchase_orders
-                SET status = $2::order_status
-                WHERE po_id = $1
-                RETURNING po_id, supplier, items, expected_date, status,
-                          additional_context, created_at, updated_at
+                WITH updated AS (
+                    UPDATE purchase_orders
+                    SET status = $2::order_status
+                    WHERE po_id = $1 AND status IS DISTINCT FROM $2::order_status
+                    RETURNING po_id, supplier, items, expected_date, status,
+                              additional_context, created_at, updated_at
+                )
+                SELECT *, 'updated' AS outcome FROM updated
+                UNION ALL
+                SELECT po_id, supplier, items, expected_date, status,
+                       additional_context, created_at, updated_at,
+                       CASE WHEN status = $2::order_status THEN 'unchanged' ELSE 'stale' END
+                FROM purchase_orders
+                WHERE po_id = $1 AND NOT EXISTS (SELECT 1 FROM updated)
             """, po_id, status.value)
-            return self._row_to_order(row) if row else None
+            if row is None or row['outcome'] == 'stale':
+                row = await self._fetch_current(conn, po_id)
+                return (self._row_to_order(row), WriteOutcome.UNCHANGED) if row else None
+            return self._row_to_order(row), WriteOutcome(row['outcome'])
+    
+    @traced("db.update_status_many")
+    async def update_status_many(self, updates: List[Tuple[str, OrderStatus]]) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Set the status of many orders in one set-based statement.
+        Rows already in the target status are not written.
+        Returns (po_id, outcome) per input id, in input order (last duplicate wins).
+        """
+        targets = dict((po_id, status) for po_id, status in updates)
+        if not targets:
+            return []
+        async with self.acquire() as conn:
+            rows = await conn.fetch("""
+                WITH input AS (
+                    SELECT u.po_id, u.status::order_status AS status
+                    FROM unnest($1::text[], $2::text[]) AS u(po_id, status)
+                ),
+                updated AS (
+                    UPDATE purchase_orders p
+                    SET status = i.status
+                    FROM input i
+                    WHERE p.po_id = i.po_id AND p.status IS DISTINCT FROM i.status
+                    RETURNING p.po_id
+                )
+                SELECT i.po_id,
+                       CASE WHEN u.po_id IS NOT NULL THEN 'updated'
+                            WHEN p.po_id IS NOT NULL THEN 'unchanged'
+                            ELSE 'not_found' END AS outcome
+                FROM input i
+                LEFT JOIN updated u ON u.po_id = i.po_id
+                LEFT JOIN purchase_orders p ON p.po_id = i.po_id
+            """, list(targets), [status.value for status in targets.values()])
+            outcomes = {row['po_id']: WriteOutcome(row['outcome']) for row in rows}
+            return [(po_id, outcomes[po_id]) for po_id in targets]
+    
+    @traced("db.update_status_where")
+    async def update_status_where(
+        self,
+        status: OrderStatus,
+        po_ids: Optional[List[str]] = None,
+        supplier: Optional[str] = None,
+        current_status: Optional[OrderStatus] = None,
+    ) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Set the status of every order matching the filter in one statement.
+        Returns (po_id, outcome) for each matched order.
+        """
+        async with self.acquire() as conn:
+            rows = await conn.fetch("""
+                WITH matched AS (
+                    SELECT po_id FROM purchase_orders
+                    WHERE ($2::text[] IS NULL OR po_id = ANY($2::text[]))
+                      AND ($3::text IS NULL OR supplier = $3::text)
+                      AND ($4::order_status IS NULL OR status = $4::order_status)
+                ),
+                updated AS (
+                    UPDATE purchase_orders p
+                    SET status = $1::order_status
+                    FROM matched m
+                    WHERE p.po_id = m.po_id AND p.status IS DISTINCT FROM $1::order_status
+                    RETURNING p.po_id
+                )
+                SELECT m.po_id,
+                       CASE WHEN u.po_id IS NULL THEN 'unchanged' ELSE 'updated' END AS outcome
+                FROM matched m
+                LEFT JOIN updated u ON u.po_id = m.po_id
+            """,
+                status.value,
+                po_ids,
+                supplier,
+                current_status.value if current_status else None,
+            )
+            return [(row['po_id'], WriteOutcome(row['outcome'])) for row in rows]
     
+    @traced("db.delete")
     async def delete(self, po_id: str) -> bool:
-        """Delete a single order by PO ID."""
+        """Delete a single order by PO ID, recording a tombstone in the same statement."""
         async with self.acquire() as conn:
             result = await conn.execute("""
-                DELETE FROM purchase_orders WHERE po_id = $1
+                WITH deleted AS (
+                    DELETE FROM purchase_orders WHERE po_id = $1 RETURNING po_id
+                )
+                INSERT INTO purchase_order_deletions (po_id)
+                SELECT po_id FROM deleted
+                ON CONFLICT (po_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
             """, po_id)
-            # Result is like "DELETE 1" or "DELETE 0"
+            # Result is like "INSERT 0 1" or "INSERT 0 0"
             return result.split()[-1] == '1'
     
+    @traced("db.delete_many")
     async def delete_many(self, po_ids: List[str]) -> int:
-        """Delete multiple orders by PO IDs."""
+        """Delete multiple orders by PO IDs, recording tombstones in the same statement."""
         if not po_ids:
             return 0
         async with self.acquire() as conn:
             result = await conn.execute("""
-                DELETE FROM purchase_orders WHERE po_id = ANY($1)
+                WITH deleted AS (
+                    DELETE FROM purchase_orders WHERE po_id = ANY($1) RETURNING po_id
+                )
+                INSERT INTO purchase_order_deletions (po_id)
+                SELECT po_id FROM deleted
+                ON CONFLICT (po_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
             """, po_ids)
-            # Result is like "DELETE 5"
+            # Result is like "INSERT 0 5"
             return int(result.split()[-1])
     
-    async def search_items(self, query: str) -> List[PurchaseOrder]:
+    @traced("db.prune_deletions")
+    async def prune_deletions(self, before: datetime) -> int:
+        """Drop tombstones older than 'before'. Returns the number removed."""
+        async with self.acquire() as conn:
+            result = await conn.execute("""
+                DELETE FROM purchase_order_deletions WHERE deleted_at < $1
+            """, before)
+            return int(result.split()[-1])
+    
+    @traced("db.search_items")
+    async def search_items(self, query: str, include_archived: bool = False) -> List[PurchaseOrder]:
         """
         Search orders by items description using trigram similarity.
         Uses the GIN index for fast text search.
+        With include_archived, archived orders are searched too (unindexed scan);
+        an archived copy of a PO that exists again in the hot table is skipped.
         """
         async with self.acquire() as conn:
+            if include_archived:
+                rows = await conn.fetch("""
+                    SELECT po_id, supplier, items, expected_date, status,
+                           additional_context, created_at, updated_at
+                    FROM purchase_orders
+                    WHERE items ILIKE $1
+                    UNION ALL
+                    SELECT a.po_id, a.supplier, a.items, a.expected_date, a.status,
+                           a.additional_context, a.created_at, a.updated_at
+                    FROM purchase_orders_archive a
+                    WHERE a.items ILIKE $1
+                      AND NOT EXISTS (SELECT 1 FROM purchase_orders p WHERE p.po_id = a.po_id)
+                    ORDER BY updated_at DESC
+                """, f"%{query}%")
+                return [self._row_to_order(row) for row in rows]
             rows = await conn.fetch("""
                 SELECT po_id, supplier, items, expected_date, status,
                        additional_context, created_at, updated_at
@@ -173,6 +469,18 @@ class PostgresDB:
                 ORDER BY updated_at DESC
             """, f"%{query}%")
             return [self._row_to_order(row) for row in rows]
+    
+    @traced("db.archive")
+    async def archive(self, cutoff: datetime, statuses: List[OrderStatus], batch_size: int) -> int:
+        """
+        Move one batch of orders last updated before 'cutoff' in one of
+        'statuses' to the archive (see archive_purchase_orders in schema.sql).
+        Returns the number of orders moved; fewer than batch_size means done.
+        """
+        async with self.acquire() as conn:
+            return await conn.fetchval("""
+                SELECT archive_purchase_orders($1, $2::text[]::order_status[], $3)
+            """, cutoff, [status.value for status in statuses], batch_size)
 
 
 # Global database instance
@@ -0,0 +1,580 @@
+"""
+Embedded SQLite Database Service
+Local, single-file backend for single-node and edge deployments, where
+round trips to a hosted database would dominate request latency.
+
+Features:
+- WAL mode: readers never block the writer and vice versa
+- One dedicated writer thread (SQLite allows a single writer at a time;
+  funnelling writes through one connection avoids lock contention and
+  busy retries) and a pool of read-only reader threads
+- FTS5 trigram index for substring item search
+- Same method surface and write outcomes as SupabaseDB / PostgresDB
+- Schema (database/schema_sqlite.sql) is applied on connect
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.schemas import PurchaseOrder, OrderStatus, WriteOutcome, ORDER_FIELD_COLUMNS
+from app.core.tracing import traced
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "database", "schema_sqlite.sql")
+
+ORDER_COLUMNS = "po_id, supplier, items, expected_date, status, additional_context, created_at, updated_at"
+CONTENT_COLUMNS = ("supplier", "items", "expected_date", "status", "additional_context")
+
+# SQLite's default limit on bound parameters is 32766; stay well below it
+MAX_VARIABLES = 500
+
+
+def _timestamp(value: Optional[datetime] = None) -> str:
+    """UTC timestamp in the fixed-width text format stored by this backend."""
+    value = (value or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class SqliteDB:
+    """Embedded SQLite database service with a writer thread and reader pool."""
+
+    def __init__(self):
+        self._path: Optional[str] = None
+        self._readers = 4
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._reader_pool: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._connect_lock = threading.Lock()
+        self._stats = {"reads": 0, "writes": 0}
+
+    def configure(self, path: str, readers: int = 4):
+        """
+        Store connection settings without opening the database.
+
+        Args:
+            path: Database file (created if missing)
+            readers: Number of reader threads / read-only connections
+        """
+        self._path = path
+        self._readers = max(readers, 1)
+
+    def connect(self, path: Optional[str] = None):
+        """
+        Apply the schema and start the writer thread and reader pool.
+        Safe to call from a background thread; concurrent calls connect once.
+        """
+        if path:
+            self.configure(path, self._readers)
+        with self._connect_lock:
+            if self._writer:
+                return
+            if not self._path:
+                raise RuntimeError("SQLite database not configured. Call configure() or connect() first.")
+
+            # WAL mode is persistent in the file; set it (and the schema) once up front
+            conn = self._open(readonly=False)
+            try:
+                conn.execute("PRAGMA journal_mode = WAL")
+                with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+                    conn.executescript(f.read())
+            finally:
+                conn.close()
+
+            self._writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="sqlite-writer",
+                initializer=self._init_thread, initargs=(False,),
+            )
+            self._reader_pool = ThreadPoolExecutor(
+                max_workers=self._readers, thread_name_prefix="sqlite-reader",
+                initializer=self._init_thread, initargs=(True,),
+            )
+
+    def disconnect(self):
+        """Stop the threads; each thread's connection closes when it exits."""
+        with self._connect_lock:
+            for pool in (self._writer, self._reader_pool):
+                if pool:
+                    pool.shutdown(wait=True)
+            self._writer = None
+            self._reader_pool = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._writer is not None
+
+    def _open(self, readonly: bool) -> sqlite3.Connection:
+        # isolation_level=None: transactions are managed explicitly
+        conn = sqlite3.connect(self._path, isolation_level=None, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous = NORMAL")  # Durable at checkpoints; safe with WAL
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA cache_size = -16000")   # 16 MB page cache per connection
+        conn.execute("PRAGMA mmap_size = 268435456")  # Map up to 256 MB for reads
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _init_thread(self, readonly: bool):
+        self._local.conn = self._open(readonly)
+
+    async def _read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        if not self._reader_pool:
+            await asyncio.to_thread(self.connect)
+        self._stats["reads"] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._reader_pool, lambda: fn(self._local.conn)
+        )
+
+    async def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        if not self._writer:
+            await asyncio.to_thread(self.connect)
+        self._stats["writes"] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._writer, lambda: fn(self._local.conn)
+        )
+
+    @staticmethod
+    @contextmanager
+    def _transaction(conn: sqlite3.Connection, write: bool = False):
+        """BEGIN IMMEDIATE for writes (take the write lock up front), deferred for reads."""
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def ping(self):
+        """Lightweight query on a reader connection. Raises on failure."""
+        self.connect()
+        self._reader_pool.submit(lambda: self._local.conn.execute("SELECT 1").fetchone()).result()
+
+    def prewarm(self, connections: Optional[int] = None):
+        """
+        Open reader connections before the first request. Runs synchronously.
+        Defaults to every reader.
+        """
+        self.connect()
+        futures = [
+            self._reader_pool.submit(lambda: self._local.conn.execute("SELECT 1").fetchone())
+            for _ in range(max(connections or self._readers, 1))
+        ]
+        for future in futures:
+            future.result()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "backend": "sqlite",
+            "path": self._path,
+            "readers": self._readers,
+            "connected": self.is_connected,
+        }
+
+    @staticmethod
+    def _display_date(value: Any) -> Any:
+        """Format an ISO date/timestamp for display, passing other values through."""
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime("%b %d, %Y")
+        except (ValueError, AttributeError):
+            return value
+
+    def _row_to_order(self, row: sqlite3.Row) -> PurchaseOrder:
+        return PurchaseOrder(
+            id=row['po_id'],
+            supplier=row['supplier'],
+            items=row['items'],
+            expected_date=self._display_date(row['expected_date']) if row['expected_date'] else None,
+            status=OrderStatus(row['status']),
+            last_updated=str(self._display_date(row['updated_at'])) if row['updated_at'] else "Unknown",
+            additional_context=row['additional_context']
+        )
+
+    def _row_to_fields(self, row: sqlite3.Row, fields: List[str]) -> Dict[str, Any]:
+        """Convert a projected row to a dict of API fields, formatted like _row_to_order."""
+        result = {}
+        for field in fields:
+            val = row[ORDER_FIELD_COLUMNS[field]]
+            if field == 'expected_date' and val:
+                val = self._display_date(val)
+            elif field == 'last_updated':
+                val = str(self._display_date(val)) if val else "Unknown"
+            result[field] = val
+        return result
+
+    @staticmethod
+    def _chunks(items: List[Any], size: int = MAX_VARIABLES):
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    @staticmethod
+    def _placeholders(count: int) -> str:
+        return ", ".join("?" * count)
+
+    @traced("db.get_all")
+    async def get_all(self, fields: Optional[List[str]] = None) -> List[Any]:
+        """
+        Retrieve all purchase orders, ordered by most recent first.
+        With 'fields' (API field names), only those columns are selected and
+        plain dicts are returned instead of PurchaseOrder objects.
+        """
+        if fields is not None:
+            columns = ", ".join(ORDER_FIELD_COLUMNS[field] for field in fields)
+            rows = await self._read(lambda conn: conn.execute(
+                f"SELECT {columns} FROM purchase_orders ORDER BY updated_at DESC"
+            ).fetchall())
+            return [self._row_to_fields(row, fields) for row in rows]
+
+        rows = await self._read(lambda conn: conn.execute(
+            f"SELECT {ORDER_COLUMNS} FROM purchase_orders ORDER BY updated_at DESC"
+        ).fetchall())
+        return [self._row_to_order(row) for row in rows]
+
+    @traced("db.clock")
+    async def clock(self) -> datetime:
+        """Current database time: embedded, so the same clock that stamps rows."""
+        return datetime.now(timezone.utc)
+
+    @traced("db.get_changes")
+    async def get_changes(self, since: datetime) -> Tuple[List[PurchaseOrder], List[str]]:
+        """
+        Orders written at or after 'since' (oldest first) and PO IDs deleted
+        since then. Tombstones for PO IDs that exist again are left out.
+        Both reads share one snapshot.
+        """
+        def read(conn):
+            with self._transaction(conn):
+                rows = conn.execute(f"""
+                    SELECT {ORDER_COLUMNS} FROM purchase_orders
+                    WHERE updated_at >= ?
+                    ORDER BY updated_at
+                """, (_timestamp(since),)).fetchall()
+                deleted = conn.execute("""
+                    SELECT d.po_id FROM purchase_order_deletions d
+                    WHERE d.deleted_at >= ?
+                      AND NOT EXISTS (SELECT 1 FROM purchase_orders p WHERE p.po_id = d.po_id)
+                    ORDER BY d.deleted_at
+                """, (_timestamp(since),)).fetchall()
+            return rows, deleted
+
+        rows, deleted = await self._read(read)
+        return [self._row_to_order(row) for row in rows], [row['po_id'] for row in deleted]
+
+    @traced("db.get_by_id")
+    async def get_by_id(self, po_id: str, include_archived: bool = False) -> Optional[PurchaseOrder]:
+        """
+        Retrieve a single order by PO ID.
+        With include_archived, falls back to the archive when the order isn't hot.
+        """
+        def read(conn):
+            row = conn.execute(
+                f"SELECT {ORDER_COLUMNS} FROM purchase_orders WHERE po_id = ?", (po_id,)
+            ).fetchone()
+            if row is None and include_archived:
+                row = conn.execute(
+                    f"SELECT {ORDER_COLUMNS} FROM purchase_orders_archive WHERE po_id = ?", (po_id,)
+                ).fetchone()
+            return row
+
+        row = await self._read(read)
+        return self._row_to_order(row) if row else None
+
+    def _upsert(self, conn: sqlite3.Connection, orders: List[PurchaseOrder]) -> Dict[str, Tuple[sqlite3.Row, WriteOutcome]]:
+        """
+        Upsert distinct orders inside the caller's write transaction.
+        The single writer thread makes read-compare-write race free, so
+        unchanged rows are detected up front and never written.
+        """
+        existing: Dict[str, sqlite3.Row] = {}
+        for chunk in self._chunks([order.id for order in orders]):
+            for row in conn.execute(
+                f"SELECT {ORDER_COLUMNS} FROM purchase_orders WHERE po_id IN ({self._placeholders(len(chunk))})",
+                chunk,
+            ):
+                existing[row['po_id']] = row
+
+        now = _timestamp()
+        inserts, updates = [], []
+        outcomes: Dict[str, WriteOutcome] = {}
+        for order in orders:
+            values = (order.supplier, order.items, order.expected_date, order.status.value, order.additional_context)
+            current = existing.get(order.id)
+            if current is None:
+                inserts.append((order.id, *values, now, now))
+                outcomes[order.id] = WriteOutcome.CREATED
+            elif tuple(current[column] for column in CONTENT_COLUMNS) != values:
+                updates.append((*values, now, order.id))
+                outcomes[order.id] = WriteOutcome.UPDATED
+            else:
+                outcomes[order.id] = WriteOutcome.UNCHANGED
+
+        conn.executemany(f"""
+            INSERT INTO purchase_orders ({ORDER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, inserts)
+        conn.executemany("""
+            UPDATE purchase_orders
+            SET supplier = ?, items = ?, expected_date = ?, status = ?, additional_context = ?, updated_at = ?
+            WHERE po_id = ?
+        """, updates)
+        return outcomes
+
+    @traced("db.add")
+    async def add(self, order: PurchaseOrder) -> Tuple[PurchaseOrder, WriteOutcome]:
+        """
+        Add or update a purchase order (upsert); identical data is not rewritten.
+        Returns a tuple of (order, outcome).
+        """
+        def write(conn):
+            with self._transaction(conn, write=True):
+                outcome = self._upsert(conn, [order])[order.id]
+                row = conn.execute(
+                    f"SELECT {ORDER_COLUMNS} FROM purchase_orders WHERE po_id = ?", (order.id,)
+                ).fetchone()
+            return row, outcome
+
+        row, outcome = await self._write(write)
+        return self._row_to_order(row), outcome
+
+    @traced("db.add_many")
+    async def add_many(self, orders: List[PurchaseOrder]) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Upsert many orders in one transaction, skipping unchanged rows.
+        Returns (po_id, outcome) per distinct PO ID, in input order (last duplicate wins).
+        """
+        latest = {order.id: order for order in orders}
+        if not latest:
+            return []
+
+        def write(conn):
+            with self._transaction(conn, write=True):
+                return self._upsert(conn, list(latest.values()))
+
+        outcomes = await self._write(write)
+        return [(po_id, outcomes[po_id]) for po_id in latest]
+
+    def _set_status(self, conn: sqlite3.Connection, targets: Dict[str, OrderStatus]) -> Dict[str, WriteOutcome]:
+        """Set statuses inside the caller's write transaction; returns outcome per id."""
+        now = _timestamp()
+        outcomes: Dict[str, WriteOutcome] = {}
+        for po_id, status in targets.items():
+            cursor = conn.execute("""
+                UPDATE purchase_orders SET status = ?, updated_at = ?
+                WHERE po_id = ? AND status IS NOT ?
+            """, (status.value, now, po_id, status.value))
+            if cursor.rowcount:
+                outcomes[po_id] = WriteOutcome.UPDATED
+            elif conn.execute("SELECT 1 FROM purchase_orders WHERE po_id = ?", (po_id,)).fetchone():
+                outcomes[po_id] = WriteOutcome.UNCHANGED
+            else:
+                outcomes[po_id] = WriteOutcome.NOT_FOUND
+        return outcomes
+
+    @traced("db.update_status")
+    async def update_status(self, po_id: str, status: OrderStatus) -> Optional[Tuple[PurchaseOrder, WriteOutcome]]:
+        """
+        Update the status of an existing order.
+        Skips the UPDATE when the order already has this status.
+        Returns (order, outcome), or None if the order doesn't exist.
+        """
+        def write(conn):
+            with self._transaction(conn, write=True):
+                outcome = self._set_status(conn, {po_id: status})[po_id]
+                row = conn.execute(
+                    f"SELECT {ORDER_COLUMNS} FROM purchase_orders WHERE po_id = ?", (po_id,)
+                ).fetchone()
+            return row, outcome
+
+        row, outcome = await self._write(write)
+        return (self._row_to_order(row), outcome) if row else None
+
+    @traced("db.update_status_many")
+    async def update_status_many(self, updates: List[Tuple[str, OrderStatus]]) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Set the status of many orders in one transaction.
+        Rows already in the target status are not written.
+        Returns (po_id, outcome) per input id, in input order (last duplicate wins).
+        """
+        targets = dict((po_id, status) for po_id, status in updates)
+        if not targets:
+            return []
+
+        def write(conn):
+            with self._transaction(conn, write=True):
+                return self._set_status(conn, targets)
+
+        outcomes = await self._write(write)
+        return [(po_id, outcomes[po_id]) for po_id in targets]
+
+    @traced("db.update_status_where")
+    async def update_status_where(
+        self,
+        status: OrderStatus,
+        po_ids: Optional[List[str]] = None,
+        supplier: Optional[str] = None,
+        current_status: Optional[OrderStatus] = None,
+    ) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Set the status of every order matching the filter in one transaction.
+        Returns (po_id, outcome) for each matched order.
+        """
+        conditions, params = [], []
+        if supplier is not None:
+            conditions.append("supplier = ?")
+            params.append(supplier)
+        if current_status is not None:
+            conditions.append("status = ?")
+            params.append(current_status.value)
+
+        def write(conn):
+            with self._transaction(conn, write=True):
+                matched: List[str] = []
+                id_chunks = list(self._chunks(po_ids)) if po_ids is not None else [None]
+                for chunk in id_chunks:
+                    where = list(conditions)
+                    args = list(params)
+                    if chunk is not None:
+                        if not chunk:
+                            continue
+                        where.append(f"po_id IN ({self._placeholders(len(chunk))})")
+                        args.extend(chunk)
+                    sql = "SELECT po_id FROM purchase_orders"
+                    if where:
+                        sql += " WHERE " + " AND ".join(where)
+                    matched.extend(row['po_id'] for row in conn.execute(sql, args))
+                return self._set_status(conn, {po_id: status for po_id in matched})
+
+        outcomes = await self._write(write)
+        return list(outcomes.items())
+
+    def _delete(self, conn: sqlite3.Connection, po_ids: List[str]) -> int:
+        """Delete orders and record their tombstones inside the caller's transaction."""
+        now = _timestamp()
+        deleted = 0
+        for chunk in self._chunks(po_ids):
+            rows = conn.execute(
+                f"DELETE FROM purchase_orders WHERE po_id IN ({self._placeholders(len(chunk))}) RETURNING po_id",
+                chunk,
+            ).fetchall()
+            conn.executemany("""
+                INSERT INTO purchase_order_deletions (po_id, deleted_at) VALUES (?, ?)
+                ON CONFLICT (po_id) DO UPDATE SET deleted_at = excluded.deleted_at
+            """, [(row['po_id'], now) for row in rows])
+            deleted += len(rows)
+        return deleted
+
+    @traced("db.delete")
+    async def delete(self, po_id: str) -> bool:
+        """Delete a single order by PO ID, recording a tombstone in the same transaction."""
+        def write(conn):
+            with self._transaction(conn, write=True):
+                return self._delete(conn, [po_id])
+
+        return await self._write(write) > 0
+
+    @traced("db.delete_many")
+    async def delete_many(self, po_ids: List[str]) -> int:
+        """Delete multiple orders by PO IDs, recording tombstones in the same transaction."""
+        if not po_ids:
+            return 0
+
+        def write(conn):
+            with self._transaction(conn, write=True):
+                return self._delete(conn, list(dict.fromkeys(po_ids)))
+
+        return await self._write(write)
+
+    @traced("db.prune_deletions")
+    async def prune_deletions(self, before: datetime) -> int:
+        """Drop tombstones older than 'before'. Returns the number removed."""
+        def write(conn):
+            with self._transaction(conn, write=True):
+                return conn.execute(
+                    "DELETE FROM purchase_order_deletions WHERE deleted_at < ?", (_timestamp(before),)
+                ).rowcount
+
+        return await self._write(write)
+
+    @traced("db.search_items")
+    async def search_items(self, query: str, include_archived: bool = False) -> List[PurchaseOrder]:
+        """
+        Search orders by items description.
+        Uses the FTS5 trigram index; queries shorter than a trigram fall back to LIKE.
+        With include_archived, archived orders are searched too (unindexed scan);
+        an archived copy of a PO that exists again in the hot table is skipped.
+        """
+        if len(query) >= 3:
+            hot_sql = f"""
+                SELECT {', '.join('p.' + c for c in ORDER_COLUMNS.split(', '))}
+                FROM purchase_orders_fts f
+                JOIN purchase_orders p ON p.rowid = f.rowid
+                WHERE purchase_orders_fts MATCH ?
+            """
+            # Quote as a phrase so FTS5 operators in user input are taken literally
+            hot_args: List[Any] = ['"' + query.replace('"', '""') + '"']
+        else:
+            hot_sql = f"SELECT {ORDER_COLUMNS} FROM purchase_orders WHERE items LIKE ?"
+            hot_args = [f"%{query}%"]
+
+        if include_archived:
+            sql = f"""
+                {hot_sql}
+                UNION ALL
+                SELECT {ORDER_COLUMNS} FROM purchase_orders_archive a
+                WHERE a.items LIKE ?
+                  AND NOT EXISTS (SELECT 1 FROM purchase_orders p WHERE p.po_id = a.po_id)
+                ORDER BY updated_at DESC
+            """
+            args = hot_args + [f"%{query}%"]
+        else:
+            sql = f"{hot_sql} ORDER BY updated_at DESC"
+            args = hot_args
+
+        rows = await self._read(lambda conn: conn.execute(sql, args).fetchall())
+        return [self._row_to_order(row) for row in rows]
+
+    @traced("db.archive")
+    async def archive(self, cutoff: datetime, statuses: List[OrderStatus], batch_size: int) -> int:
+        """
+        Move one batch of orders last updated before 'cutoff' in one of
+        'statuses' to the archive, writing delta-sync tombstones for them.
+        Returns the number of orders moved; fewer than batch_size means done.
+        """
+        if not statuses:
+            return 0
+
+        def write(conn):
+            with self._transaction(conn, write=True):
+                candidates = [row['po_id'] for row in conn.execute(f"""
+                    SELECT po_id FROM purchase_orders
+                    WHERE status IN ({self._placeholders(len(statuses))}) AND updated_at < ?
+                    ORDER BY updated_at
+                    LIMIT ?
+                """, [status.value for status in statuses] + [_timestamp(cutoff), batch_size])]
+                now = _timestamp()
+                for chunk in self._chunks(candidates):
+                    conn.execute(f"""
+                        INSERT INTO purchase_orders_archive ({ORDER_COLUMNS}, archived_at)
+                        SELECT {ORDER_COLUMNS}, ? FROM purchase_orders
+                        WHERE po_id IN ({self._placeholders(len(chunk))})
+                        ON CONFLICT (po_id) DO UPDATE SET
+                            supplier = excluded.supplier,
+                            items = excluded.items,
+                            expected_date = excluded.expected_date,
+                            status = excluded.status,
+                            additional_context = excluded.additional_context,
+                            created_at = excluded.created_at,
+                            updated_at = excluded.updated_at,
+                            archived_at = excluded.archived_at
+                    """, [now] + chunk)
+                return self._delete(conn, candidates)
+
+        return await self._write(write)
+
+
+# Global database instance
+db_sqlite = SqliteDB()
@@ -3,44 +3,186 @@ Supabase Database Service
 Using the official supabase-py client for database operations.
 
 Features:
-- Simple REST-based queries (no connection pooling needed)
+- Simple REST-based queries over a shared, tuned HTTP connection pool
+  (keep-alive, HTTP/2, pool limits and timeouts configurable via Settings)
 - Type-safe query builder
 - Compatible with Supabase Row Level Security (RLS)
+- Lazy client creation (the supabase package is imported on first connect)
 """
 
-from typing import List, Optional
-from supabase import create_client, Client
-from app.schemas import PurchaseOrder, OrderStatus
-from datetime import datetime
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from app.schemas import PurchaseOrder, OrderStatus, WriteOutcome, ORDER_FIELD_COLUMNS
+from app.core.tracing import traced
+from datetime import datetime, timezone
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
 
 
 class SupabaseDB:
     """Supabase database service."""
     
     def __init__(self):
-        self._client: Optional[Client] = None
+        self._client: Optional["Client"] = None
+        self._http: Optional["httpx.Client"] = None
+        self._supabase_url: Optional[str] = None
+        self._supabase_key: Optional[str] = None
+        self._http_options: Dict[str, Any] = {}
+        self._prewarm_connections = 2
+        self._connect_lock = threading.Lock()
+        self._stats = {"requests": 0, "tcp_connects": 0, "tls_handshakes": 0}
     
-    def connect(self, supabase_url: str, supabase_key: str):
+    def configure(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        http2: bool = True,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        prewarm_connections: int = 2,
+    ):
         """
-        Initialize the Supabase client.
+        Store connection settings without creating the client.
+        The client is created by connect() or lazily on first query.
         
         Args:
             supabase_url: Your Supabase project URL
             supabase_key: Your Supabase service role key (for backend)
+            max_connections: Upper bound on open HTTP connections to PostgREST
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept before closing
+            http2: Multiplex requests over HTTP/2 connections
+            timeout: Per-request read/write/pool timeout in seconds
+            connect_timeout: TCP + TLS connect timeout in seconds
+            prewarm_connections: Connections opened by prewarm() by default
+        """
+        self._prewarm_connections = prewarm_connections
+        self._supabase_url = supabase_url
+        self._supabase_key = supabase_key
+        self._http_options = {
+            "max_connections": max_connections,
+            "max_keepalive_connections": max_keepalive_connections,
+            "keepalive_expiry": keepalive_expiry,
+            "http2": http2,
+            "timeout": timeout,
+            "connect_timeout": connect_timeout,
+        }
+    
+    def connect(self, supabase_url: Optional[str] = None, supabase_key: Optional[str] = None):
+        """
+        Initialize the Supabase client on a shared, tuned HTTP connection pool.
+        Safe to call from a background thread; concurrent calls create one client.
+        
+        Args:
+            supabase_url: Your Supabase project URL (defaults to the configured one)
+            supabase_key: Your Supabase service role key (defaults to the configured one)
         """
-        self._client = create_client(supabase_url, supabase_key)
+        if supabase_url or supabase_key:
+            self.configure(supabase_url or self._supabase_url, supabase_key or self._supabase_key)
+        with self._connect_lock:
+            if self._client:
+                return
+            if not self._supabase_url or not self._supabase_key:
+                raise RuntimeError("Supabase client not configured. Call configure() or connect() first.")
+            import httpx
+            from supabase import ClientOptions, create_client
+            
+            options = self._http_options or {}
+            self._http = httpx.Client(
+                http2=options.get("http2", True),
+                limits=httpx.Limits(
+                    max_connections=options.get("max_connections", 20),
+                    max_keepalive_connections=options.get("max_keepalive_connections", 10),
+                    keepalive_expiry=options.get("keepalive_expiry", 60.0),
+                ),
+                timeout=httpx.Timeout(
+                    options.get("timeout", 10.0),
+                    connect=options.get("connect_timeout", 5.0),
+                ),
+                follow_redirects=True,
+                event_hooks={"request": [self._on_request]},
+            )
+            # Only PostgREST is used; storage/functions would share (and re-point) this client
+            self._client = create_client(
+                self._supabase_url,
+                self._supabase_key,
+                options=ClientOptions(httpx_client=self._http),
+            )
     
     def disconnect(self):
-        """Cleanup (no-op for REST-based client)."""
+        """Close the HTTP connection pool and drop the client."""
+        if self._http:
+            self._http.close()
+            self._http = None
         self._client = None
     
     @property
-    def client(self) -> Client:
-        """Get the Supabase client."""
+    def is_connected(self) -> bool:
+        return self._client is not None
+    
+    async def _ensure_client(self):
+        """
+        Connect in a worker thread if needed. Query methods call this first so
+        a request arriving during warm-up never blocks the event loop on the
+        supabase import or on _connect_lock.
+        """
+        if not self._client:
+            await asyncio.to_thread(self.connect)
+    
+    @property
+    def client(self) -> "Client":
+        """Get the Supabase client, connecting on first use."""
         if not self._client:
-            raise RuntimeError("Supabase client not initialized. Call connect() first.")
+            self.connect()
         return self._client
     
+    def _on_request(self, request):
+        """httpx event hook: count requests and trace new TCP/TLS connections."""
+        self._stats["requests"] += 1
+        request.extensions["trace"] = self._on_trace
+    
+    def _on_trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["tcp_connects"] += 1
+        elif event_name == "connection.start_tls.complete":
+            self._stats["tls_handshakes"] += 1
+    
+    def ping(self):
+        """Lightweight round trip to the database. Raises on failure."""
+        self.client.table('purchase_orders').select('po_id').limit(1).execute()
+    
+    def prewarm(self, connections: Optional[int] = None):
+        """
+        Open connections before the first real request by issuing a few
+        concurrent lightweight queries. Runs synchronously; call it from a thread.
+        Defaults to the configured prewarm_connections.
+        """
+        connections = connections or self._prewarm_connections
+        with ThreadPoolExecutor(max_workers=max(connections, 1)) as pool:
+            for future in [pool.submit(self.ping) for _ in range(max(connections, 1))]:
+                future.result()
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Connection pool statistics. Steady state should show tcp_connects and
+        tls_handshakes staying flat while requests keep growing.
+        """
+        stats: Dict[str, Any] = {**self._stats, **self._http_options, "connected": self.is_connected}
+        # httpx doesn't expose pool internals publicly; read them best-effort
+        pool = getattr(getattr(self._http, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections_open"] = len(connections)
+            stats["connections_idle"] = sum(1 for c in connections if c.is_idle())
+        return stats
+    
     def _row_to_order(self, row: dict) -> PurchaseOrder:
         """Convert a database row to a PurchaseOrder object."""
         # Format dates for display
@@ -71,8 +213,41 @@ class SupabaseDB:
             additional_context=row.get('additional_context')
         )
     
-    async def get_all(self) -> List[PurchaseOrder]:
-        """Retrieve all purchase orders, ordered by most recent first."""
+    @staticmethod
+    def _display_date(value: Any) -> Any:
+        """Format an ISO date/timestamp for display, passing other values through."""
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime("%b %d, %Y")
+        except (ValueError, AttributeError):
+            return value
+    
+    def _row_to_fields(self, row: dict, fields: List[str]) -> Dict[str, Any]:
+        """Convert a projected row to a dict of API fields, formatted like _row_to_order."""
+        result = {}
+        for field in fields:
+            val = row.get(ORDER_FIELD_COLUMNS[field])
+            if field == 'expected_date' and val:
+                val = self._display_date(val)
+            elif field == 'last_updated':
+                val = str(self._display_date(val)) if val else "Unknown"
+            result[field] = val
+        return result
+    
+    @traced("db.get_all")
+    async def get_all(self, fields: Optional[List[str]] = None) -> List[Any]:
+        """
+        Retrieve all purchase orders, ordered by most recent first.
+        With 'fields' (API field names), only those columns are selected and
+        plain dicts are returned instead of PurchaseOrder objects.
+        """
+        await self._ensure_client()
+        if fields is not None:
+            response = self.client.table('purchase_orders') \
+                .select(','.join(ORDER_FIELD_COLUMNS[field] for field in fields)) \
+                .order('updated_at', desc=True) \
+                .execute()
+            return [self._row_to_fields(row, fields) for row in response.data]
+        
         response = self.client.table('purchase_orders') \
             .select('*') \
             .order('updated_at', desc=True) \
@@ -80,21 +255,70 @@ class SupabaseDB:
         
         return [self._row_to_order(row) for row in response.data]
     
-    async def get_by_id(self, po_id: str) -> Optional[PurchaseOrder]:
-        """Retrieve a single order by PO ID."""
+    @traced("db.clock")
+    async def clock(self) -> datetime:
+        """
+        Current database time; delta-sync cursors are taken from it because
+        updated_at and deleted_at are set by the database, not this server.
+        """
+        await self._ensure_client()
+        response = self.client.rpc('sync_clock', {}).execute()
+        return datetime.fromisoformat(response.data)
+    
+    @traced("db.get_changes")
+    async def get_changes(self, since: datetime) -> Tuple[List[PurchaseOrder], List[str]]:
+        """
+        Orders written at or after 'since' (oldest first) and PO IDs deleted
+        since then. Tombstones for PO IDs that were re-created are left out
+        (a re-created order is always among the changed rows).
+        """
+        await self._ensure_client()
+        response = self.client.table('purchase_orders') \
+            .select('*') \
+            .gte('updated_at', since.isoformat()) \
+            .order('updated_at') \
+            .execute()
+        orders = [self._row_to_order(row) for row in response.data]
+        
+        deleted = self.client.table('purchase_order_deletions') \
+            .select('po_id') \
+            .gte('deleted_at', since.isoformat()) \
+            .order('deleted_at') \
+            .execute()
+        live = {order.id for order in orders}
+        return orders, [row['po_id'] for row in deleted.data if row['po_id'] not in live]
+    
+    @traced("db.get_by_id")
+    async def get_by_id(self, po_id: str, include_archived: bool = False) -> Optional[PurchaseOrder]:
+        """
+        Retrieve a single order by PO ID.
+        With include_archived, falls back to the archive when the order isn't hot.
+        """
+        await self._ensure_client()
         response = self.client.table('purchase_orders') \
             .select('*') \
             .eq('po_id', po_id) \
             .execute()
         
+        if not response.data and include_archived:
+            response = self.client.table('purchase_orders_archive') \
+                .select('*') \
+                .eq('po_id', po_id) \
+                .execute()
+        
         if response.data:
             return self._row_to_order(response.data[0])
         return None
     
-    async def add(self, order: PurchaseOrder) -> PurchaseOrder:
+    @traced("db.add")
+    async def add(self, order: PurchaseOrder) -> Tuple[PurchaseOrder, WriteOutcome]:
         """
         Add or update a purchase order (upsert).
+        The skip_unchanged_purchase_order_update trigger (schema.sql) drops the
+        UPDATE when nothing changed, in which case PostgREST returns no row.
+        Returns a tuple of (order, outcome).
         """
+        await self._ensure_client()
         data = {
             'po_id': order.id,
             'supplier': order.supplier,
@@ -109,33 +333,185 @@ class SupabaseDB:
             .execute()
         
         if response.data:
-            return self._row_to_order(response.data[0])
+            row = response.data[0]
+            # A fresh insert gets identical DEFAULT NOW() timestamps
+            outcome = WriteOutcome.CREATED if row.get('created_at') == row.get('updated_at') else WriteOutcome.UPDATED
+            return self._row_to_order(row), outcome
+        
+        # Upsert was skipped as a no-op: return the stored record
+        return await self.get_by_id(order.id) or order, WriteOutcome.UNCHANGED
+    
+    @traced("db.add_many")
+    async def add_many(self, orders: List[PurchaseOrder]) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Upsert many orders with one request per chunk.
+        Unchanged rows are skipped by the no-op trigger and not returned.
+        Returns (po_id, outcome) per distinct PO ID, in input order (last duplicate wins).
+        """
+        await self._ensure_client()
+        latest = {order.id: order for order in orders}
+        written: Dict[str, WriteOutcome] = {}
+        for chunk in self._chunks(list(latest)):
+            data = [
+                {
+                    'po_id': order.id,
+                    'supplier': order.supplier,
+                    'items': order.items,
+                    'expected_date': order.expected_date,
+                    'status': order.status.value,
+                    'additional_context': order.additional_context
+                }
+                for order in (latest[po_id] for po_id in chunk)
+            ]
+            response = self.client.table('purchase_orders') \
+                .upsert(data, on_conflict='po_id') \
+                .execute()
+            for row in response.data:
+                created = row.get('created_at') == row.get('updated_at')
+                written[row['po_id']] = WriteOutcome.CREATED if created else WriteOutcome.UPDATED
         
-        # If upsert didn't return data, fetch the record
-        return await self.get_by_id(order.id) or order
+        return [(po_id, written.get(po_id, WriteOutcome.UNCHANGED)) for po_id in latest]
     
-    async def update_status(self, po_id: str, status: OrderStatus) -> Optional[PurchaseOrder]:
-        """Update the status of an existing order."""
+    @traced("db.update_status")
+    async def update_status(self, po_id: str, status: OrderStatus) -> Optional[Tuple[PurchaseOrder, WriteOutcome]]:
+        """
+        Update the status of an existing order.
+        Skips the UPDATE when the order already has this status.
+        Returns (order, outcome), or None if the order doesn't exist.
+        """
+        await self._ensure_client()
         response = self.client.table('purchase_orders') \
             .update({'status': status.value}) \
             .eq('po_id', po_id) \
+            .neq('status', status.value) \
             .execute()
         
         if response.data:
-            return self._row_to_order(response.data[0])
-        return None
+            return self._row_to_order(response.data[0]), WriteOutcome.UPDATED
+        
+        # Either already in this status or missing
+        existing = await self.get_by_id(po_id)
+        return (existing, WriteOutcome.UNCHANGED) if existing else None
+    
+    @traced("db.update_status_many")
+    async def update_status_many(self, updates: List[Tuple[str, OrderStatus]]) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Set the status of many orders using batched requests:
+        one UPDATE per (target status, chunk of ids), then one lookup per chunk
+        to tell unchanged orders from missing ones.
+        Returns (po_id, outcome) per input id, in input order (last duplicate wins).
+        """
+        await self._ensure_client()
+        targets = dict((po_id, status) for po_id, status in updates)
+        if not targets:
+            return []
+        
+        by_status: Dict[OrderStatus, List[str]] = {}
+        for po_id, status in targets.items():
+            by_status.setdefault(status, []).append(po_id)
+        
+        updated = set()
+        for status, ids in by_status.items():
+            for chunk in self._chunks(ids):
+                response = self.client.table('purchase_orders') \
+                    .update({'status': status.value}) \
+                    .in_('po_id', chunk) \
+                    .neq('status', status.value) \
+                    .execute()
+                updated.update(row['po_id'] for row in response.data)
+        
+        existing = set(updated)
+        remaining = [po_id for po_id in targets if po_id not in updated]
+        for chunk in self._chunks(remaining):
+            response = self.client.table('purchase_orders') \
+                .select('po_id') \
+                .in_('po_id', chunk) \
+                .execute()
+            existing.update(row['po_id'] for row in response.data)
+        
+        def outcome(po_id: str) -> WriteOutcome:
+            if po_id in updated:
+                return WriteOutcome.UPDATED
+            return WriteOutcome.UNCHANGED if po_id in existing else WriteOutcome.NOT_FOUND
+        
+        return [(po_id, outcome(po_id)) for po_id in targets]
+    
+    @traced("db.update_status_where")
+    async def update_status_where(
+        self,
+        status: OrderStatus,
+        po_ids: Optional[List[str]] = None,
+        supplier: Optional[str] = None,
+        current_status: Optional[OrderStatus] = None,
+    ) -> List[Tuple[str, WriteOutcome]]:
+        """
+        Set the status of every order matching the filter.
+        Returns (po_id, outcome) for each matched order.
+        Explicit po_ids are sent in chunks. Per chunk, the select of rows
+        already in the target status and the update are two separate
+        requests, so unlike the PostgreSQL backend this is not atomic: a
+        concurrent write between them can be missed or reported twice.
+        """
+        await self._ensure_client()
+        def filtered(query, ids):
+            if ids is not None:
+                query = query.in_('po_id', ids)
+            if supplier is not None:
+                query = query.eq('supplier', supplier)
+            if current_status is not None:
+                query = query.eq('status', current_status.value)
+            return query
+        
+        results: List[Tuple[str, WriteOutcome]] = []
+        id_chunks = self._chunks(list(dict.fromkeys(po_ids))) if po_ids is not None else [None]
+        for ids in id_chunks:
+            # Matches already in the target status are reported, not written
+            unchanged = filtered(self.client.table('purchase_orders').select('po_id'), ids) \
+                .eq('status', status.value) \
+                .execute()
+            updated = filtered(self.client.table('purchase_orders').update({'status': status.value}), ids) \
+                .neq('status', status.value) \
+                .execute()
+            results += [(row['po_id'], WriteOutcome.UPDATED) for row in updated.data]
+            results += [(row['po_id'], WriteOutcome.UNCHANGED) for row in unchanged.data]
+        return results
+    
+    @staticmethod
+    def _chunks(items: List[str], size: int = 100):
+        """Split ids into chunks that keep PostgREST URLs short."""
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+    
+    def _record_deletions(self, po_ids: List[str]):
+        """
+        Write tombstones for deleted orders (re-deletes move deleted_at forward).
+        The deleted_at sent here is replaced by the database clock in the
+        trigger_stamp_purchase_order_deletion trigger, so tombstones compare
+        correctly with updated_at and with sync cursors under clock skew.
+        """
+        if not po_ids:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        self.client.table('purchase_order_deletions') \
+            .upsert([{'po_id': po_id, 'deleted_at': now} for po_id in po_ids], on_conflict='po_id') \
+            .execute()
     
+    @traced("db.delete")
     async def delete(self, po_id: str) -> bool:
-        """Delete a single order by PO ID."""
+        """Delete a single order by PO ID and record its tombstone."""
+        await self._ensure_client()
         response = self.client.table('purchase_orders') \
             .delete() \
             .eq('po_id', po_id) \
             .execute()
         
+        self._record_deletions([row['po_id'] for row in response.data])
         return len(response.data) > 0
     
+    @traced("db.delete_many")
     async def delete_many(self, po_ids: List[str]) -> int:
-        """Delete multiple orders by PO IDs."""
+        """Delete multiple orders by PO IDs and record their tombstones."""
+        await self._ensure_client()
         if not po_ids:
             return 0
         
@@ -144,19 +520,70 @@ class SupabaseDB:
             .in_('po_id', po_ids) \
             .execute()
         
+        self._record_deletions([row['po_id'] for row in response.data])
+        return len(response.data)
+    
+    @traced("db.prune_deletions")
+    async def prune_deletions(self, before: datetime) -> int:
+        """Drop tombstones older than 'before'. Returns the number removed."""
+        await self._ensure_client()
+        response = self.client.table('purchase_order_deletions') \
+            .delete() \
+            .lt('deleted_at', before.isoformat()) \
+            .execute()
+        
         return len(response.data)
     
-    async def search_items(self, query: str) -> List[PurchaseOrder]:
+    @traced("db.search_items")
+    async def search_items(self, query: str, include_archived: bool = False) -> List[PurchaseOrder]:
         """
         Search orders by items description using ILIKE.
+        With include_archived, archived orders are searched too; an archived
+        copy of a PO that exists again in the hot table is skipped.
         """
+        await self._ensure_client()
         response = self.client.table('purchase_orders') \
             .select('*') \
             .ilike('items', f'%{query}%') \
             .order('updated_at', desc=True) \
             .execute()
+        rows = response.data
         
-        return [self._row_to_order(row) for row in response.data]
+        if include_archived:
+            archived = self.client.table('purchase_orders_archive') \
+                .select('*') \
+                .ilike('items', f'%{query}%') \
+                .execute()
+            hot = {row['po_id'] for row in rows}
+            candidates = [row['po_id'] for row in archived.data if row['po_id'] not in hot]
+            for chunk in self._chunks(candidates):
+                live = self.client.table('purchase_orders') \
+                    .select('po_id') \
+                    .in_('po_id', chunk) \
+                    .execute()
+                hot.update(row['po_id'] for row in live.data)
+            rows = rows + [row for row in archived.data if row['po_id'] not in hot]
+            # PostgREST returns timestamps in one ISO format, so they sort as strings
+            rows.sort(key=lambda row: row.get('updated_at') or '', reverse=True)
+        
+        return [self._row_to_order(row) for row in rows]
+    
+    @traced("db.archive")
+    async def archive(self, cutoff: datetime, statuses: List[OrderStatus], batch_size: int) -> int:
+        """
+        Move one batch of orders last updated before 'cutoff' in one of
+        'statuses' to the archive, via the archive_purchase_orders() SQL
+        function (one round trip, one transaction).
+        Returns the number of orders moved; fewer than batch_size means done.
+        """
+        await self._ensure_client()
+        response = self.client.rpc('archive_purchase_orders', {
+            'p_cutoff': cutoff.isoformat(),
+            'p_statuses': [status.value for status in statuses],
+            'p_batch_size': batch_size,
+        }).execute()
+        
+        return int(response.data or 0)
 
 
 # Global database instance
@@ -0,0 +1,196 @@
+"""
+Email Preprocessor
+Strips reply history and boilerplate from pasted emails before they reach Gemini.
+
+Supplier emails are usually long reply chains; sending the whole thread makes
+prompt size (latency and token cost) grow with thread length rather than with
+new information. This stage removes:
+- Quoted reply history ("On ... wrote:" followed by "> ..." lines)
+- Outlook "-----Original Message-----" history
+- Forwarded-message separators and their Date/To/Cc lines (From and
+  Subject are kept: they name the supplier and often the PO)
+- Signatures after the standard "-- " delimiter (up to the next blank
+  line) and "Sent from my ..." lines
+- Legal / confidentiality footers
+
+History and signatures are only dropped when they are redundant: if one
+mentions a PO ID that the kept text does not, it is kept so the parser still
+sees every PO. Paragraphs mentioning a PO ID are never removed.
+"""
+
+import re
+from typing import List, Set, Tuple
+
+# PO-like identifiers: PO-45821, GT-001, PO-CHAIN-777, PO #12345
+PO_ID_PATTERN = re.compile(
+    r"\b(?:[A-Z]{1,10}-(?:[A-Z0-9]+-)*\d[A-Z0-9-]*|PO\s*#?\s*\d+)\b",
+    re.IGNORECASE,
+)
+
+ATTRIBUTION_PATTERN = re.compile(r"^\s*On\b.{0,200}\bwrote:\s*$", re.IGNORECASE)
+ORIGINAL_MESSAGE_PATTERN = re.compile(r"^\s*-{2,}\s*Original Message\s*-{2,}\s*$", re.IGNORECASE)
+FORWARD_PATTERN = re.compile(
+    r"^\s*(?:-{2,}\s*Forwarded message\s*-{2,}|Begin forwarded message:)\s*$",
+    re.IGNORECASE,
+)
+FORWARD_HEADER_PATTERN = re.compile(r"^\s*(?:From|Date|Sent|Subject|To|Cc):", re.IGNORECASE)
+# Forwarded headers worth keeping: the sender names the supplier, the subject often has the PO
+FORWARD_KEPT_HEADER_PATTERN = re.compile(r"^\s*(?:From|Subject):", re.IGNORECASE)
+SIGNATURE_DELIMITER_PATTERN = re.compile(r"^-- ?$")
+SENT_FROM_PATTERN = re.compile(r"^\s*Sent from my\b", re.IGNORECASE)
+# Lines that start a new message in a multi-email paste (ends a signature)
+MESSAGE_BOUNDARY_PATTERN = re.compile(r"^\s*(?:From:|Subject:|-{3,}\s*$)", re.IGNORECASE)
+DISCLAIMER_PATTERN = re.compile(
+    r"^\s*\**\s*(?:CONFIDENTIAL|DISCLAIMER|LEGAL NOTICE|NOTICE:|PRIVILEGED"
+    r"|This (?:e-?mail|message)\b.{0,40}\b(?:confidential|intended|privileged)"
+    r"|The information (?:contained )?in this (?:e-?mail|message)"
+    r"|Please consider the environment)",
+    re.IGNORECASE,
+)
+
+
+def _po_ids(lines: List[str]) -> Set[str]:
+    ids = set()
+    for line in lines:
+        ids.update(re.sub(r"\s+", "", m).upper() for m in PO_ID_PATTERN.findall(line))
+    return ids
+
+
+def _split_history(lines: List[str]) -> List[Tuple[str, List[str]]]:
+    """
+    Split lines into ("text", lines) and ("history", lines) blocks.
+    Signatures become history blocks (dropped later unless they mention a
+    new PO); forward separators, their Date/To/Cc lines and "Sent from"
+    lines are dropped on the way.
+    """
+    blocks: List[Tuple[str, List[str]]] = []
+    text: List[str] = []
+
+    def flush_text():
+        if text:
+            blocks.append(("text", text[:]))
+            text.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        # Outlook-style history: everything below the separator
+        if ORIGINAL_MESSAGE_PATTERN.match(line):
+            flush_text()
+            blocks.append(("history", lines[i:]))
+            break
+
+        # "On ... wrote:" followed by a quoted block
+        if ATTRIBUTION_PATTERN.match(line):
+            j = i + 1
+            while j < len(lines) and not lines[j].strip():
+                j += 1
+            k = j
+            while k < len(lines) and lines[k].lstrip().startswith(">"):
+                k += 1
+            flush_text()
+            blocks.append(("history", lines[i:k]))
+            i = k
+            continue
+
+        # Quoted block without attribution: only nested quotes mark reply history,
+        # a single level of ">" may be a plain blockquote carrying real data
+        if line.lstrip().startswith(">"):
+            k = i
+            while k < len(lines) and lines[k].lstrip().startswith(">"):
+                k += 1
+            quoted = lines[i:k]
+            if any(q.lstrip().startswith(">>") for q in quoted):
+                flush_text()
+                blocks.append(("history", quoted))
+            else:
+                text.extend(quoted)
+            i = k
+            continue
+
+        # Forwarded message: drop the separator and routing headers, keep
+        # From/Subject and the body
+        if FORWARD_PATTERN.match(line):
+            i += 1
+            while i < len(lines) and FORWARD_HEADER_PATTERN.match(lines[i]):
+                if FORWARD_KEPT_HEADER_PATTERN.match(lines[i]):
+                    text.append(lines[i])
+                i += 1
+            continue
+
+        # Signature: runs to the first blank line or the next message,
+        # whichever comes first (a pasted thread may continue with a greeting)
+        if SIGNATURE_DELIMITER_PATTERN.match(line):
+            k = i + 1
+            while k < len(lines) and lines[k].strip() and not (
+                MESSAGE_BOUNDARY_PATTERN.match(lines[k]) or ATTRIBUTION_PATTERN.match(lines[k])
+            ):
+                k += 1
+            flush_text()
+            blocks.append(("history", lines[i:k]))
+            i = k
+            continue
+
+        if SENT_FROM_PATTERN.match(line):
+            i += 1
+            continue
+
+        text.append(line)
+        i += 1
+
+    flush_text()
+    return blocks
+
+
+def _strip_disclaimers(lines: List[str]) -> List[str]:
+    """Remove blank-line separated paragraphs that are legal boilerplate."""
+    kept: List[str] = []
+    paragraph: List[str] = []
+
+    def flush_paragraph():
+        if paragraph:
+            is_disclaimer = DISCLAIMER_PATTERN.match(paragraph[0]) and not _po_ids(paragraph)
+            if not is_disclaimer:
+                kept.extend(paragraph)
+            paragraph.clear()
+
+    for line in lines:
+        if line.strip():
+            paragraph.append(line)
+        else:
+            flush_paragraph()
+            kept.append(line)
+    flush_paragraph()
+    return kept
+
+
+def strip_email_noise(email_text: str) -> Tuple[str, int]:
+    """
+    Remove redundant reply history, signatures and legal footers.
+    Returns a tuple of (cleaned_text, bytes_saved).
+    """
+    lines = email_text.replace("\r\n", "\n").split("\n")
+    blocks = _split_history(lines)
+
+    new_ids = _po_ids([line for kind, block in blocks if kind == "text" for line in block])
+
+    kept: List[str] = []
+    for kind, block in blocks:
+        # Keep history (and signatures) only if they mention a PO the kept text doesn't
+        if kind == "history":
+            block_ids = _po_ids(block)
+            if block_ids <= new_ids:
+                continue
+            new_ids |= block_ids
+        kept.extend(block)
+
+    cleaned = "\n".join(_strip_disclaimers(kept))
+    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned).strip()
+
+    # Never hand Gemini an empty prompt because of over-eager stripping
+    if not cleaned:
+        cleaned = email_text.strip()
+
+    bytes_saved = len(email_text.encode("utf-8")) - len(cleaned.encode("utf-8"))
+    return cleaned, max(bytes_saved, 0)
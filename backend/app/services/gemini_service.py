@@ -1,18 +1,123 @@
 import os
 import json
-from google import genai
-from typing import List, Tuple
+import math
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Tuple
 from app.schemas import PurchaseOrder
 from app.core.config import get_settings
+from app.core.tracing import span, traced
+from app.services.response_decoder import decode_response, validate_orders
 import time
 import asyncio
 
-settings = get_settings()
+# Gemini client, created lazily on first use (or by the startup warm-up).
+# google.genai is a heavy import, so it stays off the module import path.
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared Gemini client, creating it on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                settings = get_settings()
+                if not settings.GEMINI_API_KEY:
+                    return None
+                from google import genai
+                _client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    return _client
+
+
+async def get_client_async():
+    """
+    get_client() for async code: when the client doesn't exist yet, it is
+    created (or the warm-up thread's creation awaited) in a worker thread,
+    so the event loop never blocks on the import or on _client_lock.
+    """
+    if _client is not None:
+        return _client
+    return await asyncio.to_thread(get_client)
+
+
+# Process pool for decoding large responses off the event loop,
+# created on first use. Workers are spawned (not forked) so they don't
+# inherit the server's threads and sockets.
+_decode_pool: Optional[ProcessPoolExecutor] = None
+_decode_pool_lock = threading.Lock()
+
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    global _decode_pool
+    if _decode_pool is None:
+        with _decode_pool_lock:
+            if _decode_pool is None:
+                _decode_pool = ProcessPoolExecutor(
+                    max_workers=get_settings().PARSE_PROCESS_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _decode_pool
+
+
+def shutdown_decode_pool():
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is not None:
+            _decode_pool.shutdown(wait=False, cancel_futures=True)
+            _decode_pool = None
+
+
+def is_large_response(response_size: int) -> bool:
+    """Large responses are decoded in the pool (if enabled) and validated in batches."""
+    threshold = get_settings().PARSE_LARGE_RESPONSE_BYTES
+    return threshold > 0 and response_size >= threshold
+
+
+def decode_pool_enabled() -> bool:
+    """
+    The pool only helps when a spare core can run the workers; on a single CPU
+    they compete with the event loop thread and make its stalls longer.
+    """
+    return get_settings().PARSE_PROCESS_POOL_WORKERS > 0 and (os.cpu_count() or 1) > 1
+
+
+async def run_offloaded(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_decode_pool(), func, *args)
+
+
+async def validate_in_batches(data: List[Any]) -> Tuple[List[PurchaseOrder], List[str]]:
+    """
+    Validate a large response in batches, yielding to the event loop between
+    them so no single step holds it for the whole response.
+    Runs in-process: building the PurchaseOrder objects is what validation
+    costs, and rebuilding them from a worker's results would cost the same.
+    """
+    size = max(get_settings().PARSE_VALIDATION_BATCH_SIZE, 1)
+    orders: List[PurchaseOrder] = []
+    errors: List[str] = []
+    for start in range(0, len(data), size):
+        batch_orders, batch_errors = validate_orders(data[start:start + size], start)
+        orders.extend(batch_orders)
+        errors.extend(batch_errors)
+        await asyncio.sleep(0)
+    return orders, errors
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised instead of queueing when the limiter is saturated.
+    'retry_after' is the number of seconds until a retry would be admitted.
+    """
+    def __init__(self, retry_after: float, queue_full: bool = False):
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.queue_full = queue_full
+        reason = "too many requests waiting" if queue_full else "predicted wait too long"
+        super().__init__(f"Rate limit exceeded ({reason}); retry in {self.retry_after}s")
 
-# Initialize Client
-client = None
-if settings.GEMINI_API_KEY:
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
 
 class TokenBucket:
     """
@@ -25,21 +130,45 @@ class TokenBucket:
         self.refill_rate = refill_rate    # Tokens added per second
         self.last_refill = time.time()    # Last time we added tokens
         self._lock = asyncio.Lock()       # Async lock for thread safety
+        self.waiters = 0                  # Callers holding a future token, sleeping
+        self.rejected = 0                 # Callers turned away by admission control
 
-    async def acquire(self):
+    def _refill(self, now: float):
+        """Add tokens earned since the last refill, up to capacity."""
+        # Calculate tokens to add since last refill
+        elapsed = now - self.last_refill
+        new_tokens = elapsed * self.refill_rate
+        
+        # Refill bucket, up to capacity
+        if new_tokens > 0:
+            self.tokens = min(self.capacity, self.tokens + new_tokens)
+            self.last_refill = now
+
+    def _admission_delay(self, wait_time: float, max_wait: Optional[float], max_waiters: Optional[int]) -> Optional[Tuple[float, bool]]:
+        """
+        Seconds until a caller facing 'wait_time' would be admitted, plus whether
+        the waiter queue is the constraint. None means admit now.
+        """
+        delays = []
+        if max_waiters is not None and self.waiters >= max_waiters:
+            # Waiters wake one refill interval apart; the queue drops below the
+            # cap once all but (max_waiters - 1) of them have woken up
+            delays.append((wait_time - max_waiters / self.refill_rate, True))
+        if max_wait is not None and wait_time > max_wait:
+            # With no new arrivals the predicted wait shrinks in real time
+            delays.append((wait_time - max_wait, False))
+        return max(delays) if delays else None
+
+    @traced("ratelimit.acquire")
+    async def acquire(self, max_wait: Optional[float] = None, max_waiters: Optional[int] = None):
         """
         Attempt to acquire a token. If bucket is empty, wait until a token is available.
+        With 'max_wait' / 'max_waiters' set, raise RateLimitExceeded instead of
+        queueing when the wait would be longer or the queue is already full.
         """
         async with self._lock:
             now = time.time()
-            # Calculate tokens to add since last refill
-            elapsed = now - self.last_refill
-            new_tokens = elapsed * self.refill_rate
-            
-            # Refill bucket, up to capacity
-            if new_tokens > 0:
-                self.tokens = min(self.capacity, self.tokens + new_tokens)
-                self.last_refill = now
+            self._refill(now)
             
             # If we have a token, take it
             if self.tokens >= 1:
@@ -49,18 +178,216 @@ class TokenBucket:
             # If no tokens, calculate wait time
             needed = 1 - self.tokens
             wait_time = needed / self.refill_rate
+
+            rejection = self._admission_delay(wait_time, max_wait, max_waiters)
+            if rejection is not None:
+                self.rejected += 1
+                raise RateLimitExceeded(*rejection)
             
             # Consume the future token now
             self.tokens -= 1
             self.last_refill = now
+            self.waiters += 1
             
-        if wait_time > 0:
-            print(f"Rate limit reached. Waiting {wait_time:.2f}s...")
+        print(f"Rate limit reached. Waiting {wait_time:.2f}s...")
+        try:
             await asyncio.sleep(wait_time)
+        finally:
+            self.waiters -= 1
+
+    def try_acquire(self, reserve: float = 0.0) -> bool:
+        """
+        Take a token only if one is available right now, never waiting.
+        'reserve' tokens are left untouched for regular callers, so optional
+        work (like hedged requests) can't starve normal traffic.
+        Runs without awaiting, so it can't interleave with acquire().
+        """
+        self._refill(time.time())
+        if self.tokens - 1 >= reserve:
+            self.tokens -= 1
+            return True
+        return False
+
+    def snapshot(self) -> dict:
+        self._refill(time.time())
+        return {
+            "tokens": round(self.tokens, 2),
+            "waiters": self.waiters,
+            "rejected": self.rejected,
+        }
 
 # Rate Limits: 15 RPM
 rate_limiter = TokenBucket(capacity=5, refill_rate=0.25)
 
+class LatencyTracker:
+    """
+    Rolling window of recent Gemini call latencies (seconds).
+    Calls cancelled because a hedge won are recorded with their elapsed time,
+    a lower bound on their real latency; dropping them would bias the
+    percentile (and with it the hedge delay) low.
+    """
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        """Nearest-rank percentile, or None until enough samples exist."""
+        if len(self._samples) < max(min_samples, 1):
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgeMetrics:
+    """Counters describing how often hedged requests fire and win."""
+    def __init__(self):
+        self.requests = 0          # Parse calls that reached the model
+        self.hedges_fired = 0      # Second requests sent
+        self.hedges_skipped = 0    # Hedges wanted but denied by the rate-limit budget
+        self.hedge_wins = 0        # Hedge returned the result that was used
+        self.primary_wins = 0      # Primary returned the result that was used
+        self.hedges_rate_limited = 0  # Timed hedges skipped by GEMINI_HEDGE_MAX_RATE
+        self._recent = deque(maxlen=200)  # Whether each recent request hedged
+
+    def record_request(self, hedged: bool):
+        self._recent.append(hedged)
+
+    def recent_hedge_rate(self) -> float:
+        return sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedges_skipped_budget": self.hedges_skipped,
+            "hedges_skipped_rate": self.hedges_rate_limited,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "hedge_rate": self.hedges_fired / self.requests if self.requests else 0.0,
+            "recent_hedge_rate": self.recent_hedge_rate(),
+            "hedge_win_rate": self.hedge_wins / self.hedges_fired if self.hedges_fired else 0.0,
+            "hedge_delay_s": hedge_delay(),
+        }
+
+
+primary_latency = LatencyTracker()
+hedge_metrics = HedgeMetrics()
+
+
+def hedge_delay() -> Optional[float]:
+    """
+    How long to wait for the primary call before hedging.
+    Derived from the primary model's rolling latency percentile; falls back to a
+    fixed delay until enough samples exist. None when hedging is disabled.
+    """
+    settings = get_settings()
+    if not settings.GEMINI_HEDGE_ENABLED:
+        return None
+    observed = primary_latency.percentile(settings.GEMINI_HEDGE_PERCENTILE, settings.GEMINI_HEDGE_MIN_SAMPLES)
+    delay = observed if observed is not None else settings.GEMINI_HEDGE_DEFAULT_DELAY_S
+    return max(delay, settings.GEMINI_HEDGE_MIN_DELAY_S)
+
+
+async def _attempt(client, model: str, prompt: str, is_primary: bool) -> Tuple[Any, Any, Optional[Exception]]:
+    """
+    One model call plus JSON decode.
+    Returns (response, data, decode_error); API errors are raised.
+    """
+    start = time.perf_counter()
+    try:
+        response = await client.aio.models.generate_content(model=model, contents=prompt)
+    except asyncio.CancelledError:
+        # Lost to the hedge: the call took at least this long (censored sample)
+        if is_primary:
+            primary_latency.record(time.perf_counter() - start)
+        raise
+    if is_primary:
+        primary_latency.record(time.perf_counter() - start)
+
+    try:
+        with span("gemini.decode"):
+            text = response.text
+            if is_large_response(len(text)) and decode_pool_enabled():
+                return response, await run_offloaded(decode_response, text), None
+            return response, decode_response(text), None
+    except Exception as e:
+        return response, None, e
+
+
+async def generate_with_hedging(client, prompt: str) -> Tuple[Any, Any, Optional[Exception]]:
+    """
+    Call the primary model; if it hasn't answered by the hedge delay (or it
+    fails outright), send a second request - to GEMINI_HEDGE_MODEL_NAME if set -
+    and use whichever valid (JSON-decodable) result arrives first.
+    The hedge only fires if the rate limiter can spare a token beyond its reserve,
+    and a timed hedge is skipped while the recent hedge rate is above
+    GEMINI_HEDGE_MAX_RATE (a fallback for a failed primary is not capped).
+    Returns (response, data, decode_error) like _attempt.
+    """
+    settings = get_settings()
+    hedge_model = settings.GEMINI_HEDGE_MODEL_NAME or settings.GEMINI_MODEL_NAME
+    delay = hedge_delay()
+    hedge_metrics.requests += 1
+
+    primary = asyncio.create_task(_attempt(client, settings.GEMINI_MODEL_NAME, prompt, is_primary=True))
+    pending = {primary}
+    hedge_considered = False
+    hedged = False
+
+    def fire_hedge(timed: bool):
+        # At most one hedge per request, and only when hedging is enabled
+        nonlocal hedge_considered, hedged
+        if hedge_considered or delay is None:
+            return
+        hedge_considered = True
+        if timed and hedge_metrics.recent_hedge_rate() > settings.GEMINI_HEDGE_MAX_RATE:
+            hedge_metrics.hedges_rate_limited += 1
+        elif rate_limiter.try_acquire(reserve=settings.GEMINI_HEDGE_TOKEN_RESERVE):
+            pending.add(asyncio.create_task(_attempt(client, hedge_model, prompt, is_primary=False)))
+            hedge_metrics.hedges_fired += 1
+            hedged = True
+        else:
+            hedge_metrics.hedges_skipped += 1
+
+    fallback_result = None
+    last_error: Optional[Exception] = None
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                fire_hedge(timed=True)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    result = task.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if result[2] is None:
+                    if task is primary:
+                        hedge_metrics.primary_wins += 1
+                    else:
+                        hedge_metrics.hedge_wins += 1
+                    return result
+                fallback_result = result
+            # Primary failed or returned garbage before the deadline: fall back now
+            if not pending:
+                fire_hedge(timed=False)
+    finally:
+        hedge_metrics.record_request(hedged)
+        for task in pending:
+            task.cancel()
+
+    if fallback_result is not None:
+        return fallback_result
+    raise last_error
+
+
 PROMPT_TEMPLATE = """
 You are an intelligent Purchase Order extraction assistant.
 The user may paste one or multiple emails. Your job is to identify each separate email/PO and extract information from ALL of them.
@@ -108,22 +435,29 @@ Return ONLY a valid JSON array of objects. Example format:
 Do not include markdown formatting like ```json. Return ONLY the JSON array.
 """
 
-async def parse_email_with_gemini(email_text: str) -> Tuple[List[PurchaseOrder], List[str]]:
+async def parse_email_with_gemini(
+    email_text: str,
+    max_wait: Optional[float] = None,
+    max_waiters: Optional[int] = None,
+) -> Tuple[List[PurchaseOrder], List[str]]:
     """
     Parse one or multiple emails and return a list of PurchaseOrders.
     Returns a tuple of (parsed_orders, errors).
+    'max_wait' / 'max_waiters' bound the rate-limit queue (see TokenBucket.acquire);
+    by default the call waits as long as it takes.
     """
+    client = await get_client_async()
     if not client:
         raise Exception("GEMINI_API_KEY is not set or client initialization failed")
         
-    # Rate Limiting: Wait for token
-    await rate_limiter.acquire()
+    # Rate Limiting: Wait for token (or raise RateLimitExceeded if over the bounds)
+    await rate_limiter.acquire(max_wait=max_wait, max_waiters=max_waiters)
 
     try:
-        response = client.models.generate_content(
-            model=settings.GEMINI_MODEL_NAME,
-            contents=PROMPT_TEMPLATE.format(email_text=email_text)
-        )
+        with span("gemini.generate"):
+            response, data, decode_error = await generate_with_hedging(
+                client, PROMPT_TEMPLATE.format(email_text=email_text)
+            )
     except Exception as e:
         return [], [f"Gemini API Error: {str(e)}"]
 
@@ -131,29 +465,19 @@ async def parse_email_with_gemini(email_text: str) -> Tuple[List[PurchaseOrder],
     errors: List[str] = []
 
     try:
-        # Clean response if it contains markdown code blocks
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        data = json.loads(text)
+        if decode_error:
+            raise decode_error
 
         # Ensure we have a list
         if isinstance(data, dict):
             data = [data]
 
-        # Parse each order
-        for i, order_data in enumerate(data):
-            try:
-                # Clean null values - replace with empty strings to let defaults work
-                cleaned_data = {}
-                for key, value in order_data.items():
-                    if value is None:
-                        continue  # Skip null values, let Pydantic use defaults
-                    cleaned_data[key] = value
-
-                parsed_orders.append(PurchaseOrder(**cleaned_data))
-            except Exception as e:
-                # Include PO ID in error if available for better debugging
-                po_id = order_data.get('id', f'entry {i+1}')
-                errors.append(f"Failed to parse order '{po_id}': {str(e)}")
+        # Parse each order (large responses in batches, yielding in between)
+        with span("gemini.validate"):
+            if isinstance(data, list) and is_large_response(len(response.text)):
+                parsed_orders, errors = await validate_in_batches(data)
+            else:
+                parsed_orders, errors = validate_orders(data)
 
         if not parsed_orders and not errors:
             errors.append("No purchase orders found in the provided text.")
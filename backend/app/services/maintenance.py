@@ -0,0 +1,58 @@
+"""
+Background Maintenance
+Periodic housekeeping started from the application lifespan.
+
+Tasks:
+- Archive cold orders (ARCHIVE_ENABLED): orders in a terminal status that
+  haven't changed for ARCHIVE_AFTER_DAYS move to purchase_orders_archive in
+  batches of ARCHIVE_BATCH_SIZE, each batch its own short transaction
+- Prune delta-sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS
+  (clients whose cursor is older than that get a full reset instead)
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import Settings
+from app.schemas import OrderStatus
+from app.services.db import db
+
+# Pause between archive batches so archival never monopolizes the database
+ARCHIVE_BATCH_PAUSE_S = 0.5
+
+
+async def archive_cold_orders(settings: Settings) -> int:
+    """Archive batches until no candidates remain. Returns the total moved."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    statuses = [OrderStatus(status) for status in settings.ARCHIVE_STATUSES]
+    total = 0
+    while True:
+        moved = await db.archive(cutoff, statuses, settings.ARCHIVE_BATCH_SIZE)
+        total += moved
+        if moved < settings.ARCHIVE_BATCH_SIZE:
+            return total
+        await asyncio.sleep(ARCHIVE_BATCH_PAUSE_S)
+
+
+async def run_maintenance(settings: Settings):
+    """One housekeeping pass."""
+    if settings.ARCHIVE_ENABLED:
+        archived = await archive_cold_orders(settings)
+        if archived:
+            print(f"[maintenance] Archived {archived} order(s)")
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    pruned = await db.prune_deletions(cutoff)
+    if pruned:
+        print(f"[maintenance] Pruned {pruned} tombstone(s) older than {cutoff:%Y-%m-%d}")
+
+
+async def maintenance_loop(settings: Settings):
+    while True:
+        try:
+            await run_maintenance(settings)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[maintenance] Pass failed: {e}")
+        await asyncio.sleep(settings.MAINTENANCE_INTERVAL_S)
@@ -0,0 +1,41 @@
+"""
+Response Decoder
+JSON cleanup, decoding and PurchaseOrder validation for Gemini responses.
+
+Kept free of heavy imports (no google.genai, FastAPI or DB clients) because
+large responses are decoded in a process pool: spawned workers import only
+this module and app.schemas.
+"""
+
+import json
+from typing import Any, List, Tuple
+
+from app.schemas import PurchaseOrder
+
+
+def decode_response(text: str) -> Any:
+    """Strip markdown code fences and decode. Raises json.JSONDecodeError."""
+    # Clean response if it contains markdown code blocks
+    text = text.replace("```json", "").replace("```", "").strip()
+    return json.loads(text)
+
+
+def validate_orders(data: List[Any], start: int = 0) -> Tuple[List[PurchaseOrder], List[str]]:
+    """
+    Validate decoded entries into PurchaseOrders.
+    'start' is the position of data[0] in the full response, used in error messages.
+    Returns a tuple of (orders, errors).
+    """
+    orders: List[PurchaseOrder] = []
+    errors: List[str] = []
+    for i, order_data in enumerate(data, start):
+        try:
+            # Skip null values, let Pydantic use defaults
+            cleaned_data = {key: value for key, value in order_data.items() if value is not None}
+            orders.append(PurchaseOrder(**cleaned_data))
+        except Exception as e:
+            # Include PO ID in error if available for better debugging
+            po_id = order_data.get('id', f'entry {i+1}') if isinstance(order_data, dict) else f'entry {i+1}'
+            errors.append(f"Failed to parse order '{po_id}': {str(e)}")
+    return orders, errors
+
@@ -4,9 +4,14 @@
 -- ============================================================================
 
 -- Drop triggers first (depends on functions)
+DROP TRIGGER IF EXISTS trigger_skip_unchanged_purchase_orders_update ON purchase_orders;
 DROP TRIGGER IF EXISTS trigger_update_purchase_orders_timestamp ON purchase_orders;
 
 -- Drop tables (CASCADE handles dependent objects)
+DROP FUNCTION IF EXISTS archive_purchase_orders(TIMESTAMP WITH TIME ZONE, order_status[], INTEGER);
+DROP FUNCTION IF EXISTS sync_clock();
+DROP TABLE IF EXISTS purchase_orders_archive CASCADE;
+DROP TABLE IF EXISTS purchase_order_deletions CASCADE;
 DROP TABLE IF EXISTS purchase_orders CASCADE;
 
 -- Drop custom types
@@ -40,6 +45,25 @@ CREATE TABLE purchase_orders (
     updated_at          TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Create deletions log (tombstones for delta sync)
+CREATE TABLE purchase_order_deletions (
+    po_id               VARCHAR(100) PRIMARY KEY,
+    deleted_at          TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Create archive (cold storage for old orders in terminal statuses)
+CREATE TABLE purchase_orders_archive (
+    po_id               VARCHAR(100) PRIMARY KEY,
+    supplier            VARCHAR(255) NOT NULL,
+    items               TEXT NOT NULL,
+    expected_date       VARCHAR(100),
+    status              order_status NOT NULL,
+    additional_context  TEXT,
+    created_at          TIMESTAMP WITH TIME ZONE,
+    updated_at          TIMESTAMP WITH TIME ZONE,
+    archived_at         TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
 -- Create indexes
 CREATE INDEX idx_purchase_orders_status ON purchase_orders(status);
 CREATE INDEX idx_purchase_orders_supplier ON purchase_orders(supplier);
@@ -47,6 +71,74 @@ CREATE INDEX idx_purchase_orders_status_supplier ON purchase_orders(status, supp
 CREATE INDEX idx_purchase_orders_items_trgm ON purchase_orders USING GIN (items gin_trgm_ops);
 CREATE INDEX idx_purchase_orders_created_at ON purchase_orders(created_at DESC);
 CREATE INDEX idx_purchase_orders_updated_at ON purchase_orders(updated_at DESC);
+CREATE INDEX idx_purchase_orders_status_updated_at ON purchase_orders(status, updated_at);
+CREATE INDEX idx_purchase_order_deletions_deleted_at ON purchase_order_deletions(deleted_at);
+
+-- Create no-op update guard (must sort before the timestamp trigger)
+CREATE OR REPLACE FUNCTION skip_unchanged_purchase_order_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (NEW.supplier, NEW.items, NEW.expected_date, NEW.status, NEW.additional_context)
+        IS NOT DISTINCT FROM
+       (OLD.supplier, OLD.items, OLD.expected_date, OLD.status, OLD.additional_context)
+    THEN
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_skip_unchanged_purchase_orders_update
+    BEFORE UPDATE ON purchase_orders
+    FOR EACH ROW
+    EXECUTE FUNCTION skip_unchanged_purchase_order_update();
+
+-- Create archival batch function
+CREATE OR REPLACE FUNCTION archive_purchase_orders(
+    p_cutoff TIMESTAMP WITH TIME ZONE,
+    p_statuses order_status[],
+    p_batch_size INTEGER
+)
+RETURNS INTEGER AS $$
+    WITH candidates AS (
+        SELECT internal_id
+        FROM purchase_orders
+        WHERE status = ANY(p_statuses) AND updated_at < p_cutoff
+        ORDER BY updated_at
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        DELETE FROM purchase_orders p
+        USING candidates c
+        WHERE p.internal_id = c.internal_id
+        RETURNING p.po_id, p.supplier, p.items, p.expected_date, p.status,
+                  p.additional_context, p.created_at, p.updated_at
+    ),
+    archived AS (
+        INSERT INTO purchase_orders_archive
+            (po_id, supplier, items, expected_date, status, additional_context, created_at, updated_at)
+        SELECT po_id, supplier, items, expected_date, status, additional_context, created_at, updated_at
+        FROM moved
+        -- A re-created PO archived again replaces its older archived copy
+        ON CONFLICT (po_id) DO UPDATE SET
+            supplier = EXCLUDED.supplier,
+            items = EXCLUDED.items,
+            expected_date = EXCLUDED.expected_date,
+            status = EXCLUDED.status,
+            additional_context = EXCLUDED.additional_context,
+            created_at = EXCLUDED.created_at,
+            updated_at = EXCLUDED.updated_at,
+            archived_at = NOW()
+        RETURNING po_id
+    ),
+    tombstones AS (
+        INSERT INTO purchase_order_deletions (po_id)
+        SELECT po_id FROM moved
+        ON CONFLICT (po_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
+    )
+    SELECT count(*)::INTEGER FROM archived;
+$$ LANGUAGE sql;
 
 -- Create auto-update trigger
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -62,6 +154,29 @@ CREATE TRIGGER trigger_update_purchase_orders_timestamp
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Database clock for delta-sync cursors. Row timestamps (updated_at,
+-- deleted_at) come from the database, so cursors must too; the app
+-- server's clock may drift from it by more than the cursor overlap.
+CREATE OR REPLACE FUNCTION sync_clock()
+RETURNS TIMESTAMP WITH TIME ZONE AS $$
+    SELECT clock_timestamp();
+$$ LANGUAGE sql VOLATILE;
+
+-- Stamp tombstones with the database clock, whoever writes them (the
+-- Supabase backend upserts them over PostgREST)
+CREATE OR REPLACE FUNCTION stamp_purchase_order_deletion()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.deleted_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_stamp_purchase_order_deletion
+    BEFORE INSERT OR UPDATE ON purchase_order_deletions
+    FOR EACH ROW
+    EXECUTE FUNCTION stamp_purchase_order_deletion();
+
 -- Confirmation message
 DO $$ BEGIN
     RAISE NOTICE 'Database reset complete. All tables and indexes recreated.';
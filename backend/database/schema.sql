@@ -61,6 +61,31 @@ CREATE TABLE IF NOT EXISTS purchase_orders (
     updated_at          TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Deletions log: one tombstone per deleted PO ID, so clients syncing with
+-- GET /api/orders/changes learn about deletes. Re-deleting a re-created PO
+-- just moves its deleted_at forward. Old entries are pruned after the
+-- tombstone retention window (SYNC_TOMBSTONE_RETENTION_DAYS).
+CREATE TABLE IF NOT EXISTS purchase_order_deletions (
+    po_id               VARCHAR(100) PRIMARY KEY,
+    deleted_at          TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Archive: cold storage for orders past ARCHIVE_AFTER_DAYS in a terminal
+-- status (e.g. long-Shipped). Rows are moved here by archive_purchase_orders()
+-- so the hot table, its indexes and the trigram GIN index stay small.
+-- Only the primary key is indexed; archive lookups are explicit and rare.
+CREATE TABLE IF NOT EXISTS purchase_orders_archive (
+    po_id               VARCHAR(100) PRIMARY KEY,
+    supplier            VARCHAR(255) NOT NULL,
+    items               TEXT NOT NULL,
+    expected_date       VARCHAR(100),
+    status              order_status NOT NULL,
+    additional_context  TEXT,
+    created_at          TIMESTAMP WITH TIME ZONE,
+    updated_at          TIMESTAMP WITH TIME ZONE,
+    archived_at         TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
 -- ============================================================================
 -- INDEXES FOR PERFORMANCE
 -- ============================================================================
@@ -92,9 +117,19 @@ CREATE INDEX IF NOT EXISTS idx_purchase_orders_created_at
     ON purchase_orders(created_at DESC);
 
 -- Index on updated_at: Fast ordering by last update
+-- Also serves delta sync: "rows changed since <cursor>" is a range scan
 CREATE INDEX IF NOT EXISTS idx_purchase_orders_updated_at 
     ON purchase_orders(updated_at DESC);
 
+-- Composite index on (status, updated_at): Finds archival candidates
+-- Example: "Shipped orders not touched in 90 days"
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_status_updated_at
+    ON purchase_orders(status, updated_at);
+
+-- Index on deleted_at: Tombstones since <cursor>, and retention pruning
+CREATE INDEX IF NOT EXISTS idx_purchase_order_deletions_deleted_at
+    ON purchase_order_deletions(deleted_at);
+
 -- ============================================================================
 -- FUNCTIONS & TRIGGERS
 -- ============================================================================
@@ -108,6 +143,99 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Function to skip updates that don't change any order content.
+-- Returning NULL from a BEFORE UPDATE trigger cancels the row update, so
+-- re-imports of identical data write nothing (no new tuple, no WAL churn,
+-- no updated_at bump). Upserts via PostgREST then return no row.
+CREATE OR REPLACE FUNCTION skip_unchanged_purchase_order_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (NEW.supplier, NEW.items, NEW.expected_date, NEW.status, NEW.additional_context)
+        IS NOT DISTINCT FROM
+       (OLD.supplier, OLD.items, OLD.expected_date, OLD.status, OLD.additional_context)
+    THEN
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Database clock for delta-sync cursors. Row timestamps (updated_at,
+-- deleted_at) come from the database, so cursors must too; the app
+-- server's clock may drift from it by more than the cursor overlap.
+CREATE OR REPLACE FUNCTION sync_clock()
+RETURNS TIMESTAMP WITH TIME ZONE AS $$
+    SELECT clock_timestamp();
+$$ LANGUAGE sql VOLATILE;
+
+-- Stamp tombstones with the database clock, whoever writes them (the
+-- Supabase backend upserts them over PostgREST)
+CREATE OR REPLACE FUNCTION stamp_purchase_order_deletion()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.deleted_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move one batch of cold orders into the archive and return how many moved.
+-- Candidate rows are locked with SKIP LOCKED so a batch never waits on (or
+-- blocks) concurrent writes, and each moved PO gets a delta-sync tombstone
+-- because it is no longer part of the default (hot) result set.
+CREATE OR REPLACE FUNCTION archive_purchase_orders(
+    p_cutoff TIMESTAMP WITH TIME ZONE,
+    p_statuses order_status[],
+    p_batch_size INTEGER
+)
+RETURNS INTEGER AS $$
+    WITH candidates AS (
+        SELECT internal_id
+        FROM purchase_orders
+        WHERE status = ANY(p_statuses) AND updated_at < p_cutoff
+        ORDER BY updated_at
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    moved AS (
+        DELETE FROM purchase_orders p
+        USING candidates c
+        WHERE p.internal_id = c.internal_id
+        RETURNING p.po_id, p.supplier, p.items, p.expected_date, p.status,
+                  p.additional_context, p.created_at, p.updated_at
+    ),
+    archived AS (
+        INSERT INTO purchase_orders_archive
+            (po_id, supplier, items, expected_date, status, additional_context, created_at, updated_at)
+        SELECT po_id, supplier, items, expected_date, status, additional_context, created_at, updated_at
+        FROM moved
+        -- A re-created PO archived again replaces its older archived copy
+        ON CONFLICT (po_id) DO UPDATE SET
+            supplier = EXCLUDED.supplier,
+            items = EXCLUDED.items,
+            expected_date = EXCLUDED.expected_date,
+            status = EXCLUDED.status,
+            additional_context = EXCLUDED.additional_context,
+            created_at = EXCLUDED.created_at,
+            updated_at = EXCLUDED.updated_at,
+            archived_at = NOW()
+        RETURNING po_id
+    ),
+    tombstones AS (
+        INSERT INTO purchase_order_deletions (po_id)
+        SELECT po_id FROM moved
+        ON CONFLICT (po_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
+    )
+    SELECT count(*)::INTEGER FROM archived;
+$$ LANGUAGE sql;
+
+-- Trigger to drop no-op updates
+-- Triggers fire in name order: this must sort before the timestamp trigger
+DROP TRIGGER IF EXISTS trigger_skip_unchanged_purchase_orders_update ON purchase_orders;
+CREATE TRIGGER trigger_skip_unchanged_purchase_orders_update
+    BEFORE UPDATE ON purchase_orders
+    FOR EACH ROW
+    EXECUTE FUNCTION skip_unchanged_purchase_order_update();
+
 -- Trigger to auto-update updated_at on any row modification
 DROP TRIGGER IF EXISTS trigger_update_purchase_orders_timestamp ON purchase_orders;
 CREATE TRIGGER trigger_update_purchase_orders_timestamp
@@ -115,6 +243,13 @@ CREATE TRIGGER trigger_update_purchase_orders_timestamp
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Trigger to stamp tombstones (inserts and re-deletes) with the database clock
+DROP TRIGGER IF EXISTS trigger_stamp_purchase_order_deletion ON purchase_order_deletions;
+CREATE TRIGGER trigger_stamp_purchase_order_deletion
+    BEFORE INSERT OR UPDATE ON purchase_order_deletions
+    FOR EACH ROW
+    EXECUTE FUNCTION stamp_purchase_order_deletion();
+
 -- ============================================================================
 -- COMMENTS (Documentation)
 -- ============================================================================
@@ -124,3 +259,5 @@ COMMENT ON COLUMN purchase_orders.internal_id IS 'Auto-increment internal ID for
 COMMENT ON COLUMN purchase_orders.po_id IS 'Business-facing PO identifier (e.g., PO-45821)';
 COMMENT ON COLUMN purchase_orders.status IS 'Current order status: On Track, Product Delays, Shipped, Shipment Delay';
 COMMENT ON COLUMN purchase_orders.items IS 'Description of items in the order (supports text search)';
+COMMENT ON TABLE purchase_order_deletions IS 'Tombstones of deleted PO IDs for incremental client sync';
+COMMENT ON TABLE purchase_orders_archive IS 'Cold storage for old orders in terminal statuses (see archive_purchase_orders)';
@@ -0,0 +1,91 @@
+-- ============================================================================
+-- Purchase Order Management System - SQLite Schema
+-- Embedded backend for single-node / edge deployments (DB_BACKEND=sqlite).
+-- Mirrors schema.sql; applied automatically on connect (idempotent).
+-- ============================================================================
+
+-- Timestamps are UTC ISO-8601 strings with microseconds and a trailing 'Z'
+-- ("2025-01-15T08:30:00.000000Z"), written by the application so they sort
+-- and compare correctly as text.
+
+-- ============================================================================
+-- TABLES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS purchase_orders (
+    -- Implicit rowid is the internal id (and the FTS content rowid)
+    po_id               TEXT NOT NULL UNIQUE,
+    supplier            TEXT NOT NULL DEFAULT 'Unknown Supplier',
+    items               TEXT NOT NULL DEFAULT 'Items not specified',
+    expected_date       TEXT,
+    -- CHECK stands in for the PostgreSQL ENUM
+    status              TEXT NOT NULL DEFAULT 'On Track'
+                        CHECK (status IN ('On Track', 'Product Delays', 'Shipped', 'Shipment Delay')),
+    additional_context  TEXT,
+    created_at          TEXT NOT NULL,
+    updated_at          TEXT NOT NULL
+);
+
+-- Tombstones for delta sync (see purchase_order_deletions in schema.sql)
+CREATE TABLE IF NOT EXISTS purchase_order_deletions (
+    po_id               TEXT PRIMARY KEY,
+    deleted_at          TEXT NOT NULL
+);
+
+-- Cold storage for archived orders (see purchase_orders_archive in schema.sql)
+CREATE TABLE IF NOT EXISTS purchase_orders_archive (
+    po_id               TEXT PRIMARY KEY,
+    supplier            TEXT NOT NULL,
+    items               TEXT NOT NULL,
+    expected_date       TEXT,
+    status              TEXT NOT NULL,
+    additional_context  TEXT,
+    created_at          TEXT,
+    updated_at          TEXT,
+    archived_at         TEXT NOT NULL
+);
+
+-- ============================================================================
+-- INDEXES
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_status ON purchase_orders(status);
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_supplier ON purchase_orders(supplier);
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_status_supplier ON purchase_orders(status, supplier);
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_status_updated_at ON purchase_orders(status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_updated_at ON purchase_orders(updated_at);
+CREATE INDEX IF NOT EXISTS idx_purchase_order_deletions_deleted_at ON purchase_order_deletions(deleted_at);
+
+-- ============================================================================
+-- FULL-TEXT SEARCH
+-- ============================================================================
+
+-- FTS5 index over items. The trigram tokenizer matches arbitrary substrings
+-- (like ILIKE '%keyword%' with the pg_trgm GIN index), case-insensitively.
+-- External content: the text lives only in purchase_orders.
+CREATE VIRTUAL TABLE IF NOT EXISTS purchase_orders_fts USING fts5(
+    items,
+    content='purchase_orders',
+    content_rowid='rowid',
+    tokenize='trigram'
+);
+
+-- Keep the FTS index in sync with the table
+CREATE TRIGGER IF NOT EXISTS trigger_purchase_orders_fts_insert
+    AFTER INSERT ON purchase_orders
+BEGIN
+    INSERT INTO purchase_orders_fts(rowid, items) VALUES (NEW.rowid, NEW.items);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_purchase_orders_fts_delete
+    AFTER DELETE ON purchase_orders
+BEGIN
+    INSERT INTO purchase_orders_fts(purchase_orders_fts, rowid, items) VALUES ('delete', OLD.rowid, OLD.items);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_purchase_orders_fts_update
+    AFTER UPDATE OF items ON purchase_orders
+BEGIN
+    INSERT INTO purchase_orders_fts(purchase_orders_fts, rowid, items) VALUES ('delete', OLD.rowid, OLD.items);
+    INSERT INTO purchase_orders_fts(rowid, items) VALUES (NEW.rowid, NEW.items);
+END;
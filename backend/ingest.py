@@ -0,0 +1,228 @@
+"""
+Mailbox Ingestion - Headless batch import of supplier emails
+Streams messages from a Maildir or mbox, parses them with Gemini and upserts
+the resulting purchase orders in batches.
+
+Features:
+- De-duplication by Message-ID and by content hash (forwarded copies, re-exports)
+- Parses at the rate limiter's full sustained throughput (concurrent workers
+  all gated by the shared TokenBucket)
+- Batched upserts via db.add_many (unchanged orders cost no writes)
+- Checkpointing: a message is recorded only after its orders are stored, so a
+  restart resumes where the previous run left off
+
+Usage:
+    python ingest.py /path/to/Maildir
+    python ingest.py /path/to/archive.mbox --batch-size 100
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import mailbox
+import os
+import re
+from email.message import Message
+from typing import Iterator, List, Optional, Set, Tuple
+
+from app.core.config import get_settings
+from app.schemas import PurchaseOrder
+from app.services.db import db, configure_db
+from app.services.email_preprocessor import strip_email_noise
+from app.services.gemini_service import parse_email_with_gemini, rate_limiter
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of messages that are fully ingested."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.message_ids: Set[str] = set()
+        self.hashes: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry.get("message_id"):
+                            self.message_ids.add(entry["message_id"])
+                        self.hashes.add(entry["hash"])
+
+    def seen(self, message_id: Optional[str], content_hash: str) -> bool:
+        return (message_id is not None and message_id in self.message_ids) or content_hash in self.hashes
+
+    def mark(self, message_id: Optional[str], content_hash: str):
+        """Remember a message in memory (not yet durable)."""
+        if message_id:
+            self.message_ids.add(message_id)
+        self.hashes.add(content_hash)
+
+    def commit(self, entries: List[Tuple[Optional[str], str]]):
+        """Durably record messages whose orders have been stored."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            for message_id, content_hash in entries:
+                f.write(json.dumps({"message_id": message_id, "hash": content_hash}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def open_mailbox(path: str, fmt: str) -> mailbox.Mailbox:
+    if fmt == "auto":
+        fmt = "maildir" if os.path.isdir(path) else "mbox"
+    if fmt == "maildir":
+        return mailbox.Maildir(path, factory=None, create=False)
+    return mailbox.mbox(path, create=False)
+
+
+def message_text(msg: Message) -> str:
+    """Headers the parser cares about plus the best text body."""
+    body = None
+    html = None
+    for part in msg.walk() if msg.is_multipart() else [msg]:
+        if part.get_content_maintype() == "multipart" or part.get_filename():
+            continue
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            continue
+        text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+        if part.get_content_type() == "text/plain" and body is None:
+            body = text
+        elif part.get_content_type() == "text/html" and html is None:
+            html = text
+    if body is None and html is not None:
+        body = re.sub(r"<[^>]+>", " ", html)
+
+    headers = [f"{name}: {msg[name]}" for name in ("From", "Date", "Subject") if msg[name]]
+    return "\n".join(headers) + "\n\n" + (body or "")
+
+
+def iter_messages(box: mailbox.Mailbox) -> Iterator[Tuple[Optional[str], str]]:
+    """Yield (message_id, text) lazily, one message at a time."""
+    for key in box.iterkeys():
+        try:
+            msg = box[key]
+        except Exception as e:
+            print(f"[X] Skipping unreadable message {key}: {e}")
+            continue
+        message_id = (msg["Message-ID"] or "").strip() or None
+        yield message_id, message_text(msg)
+
+
+def content_hash(text: str) -> str:
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class Ingestor:
+    """Parses messages and buffers their orders until a batch is ready to upsert."""
+
+    def __init__(self, checkpoint: Checkpoint, batch_size: int):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.pending_orders: List[PurchaseOrder] = []
+        self.pending_entries: List[Tuple[Optional[str], str]] = []
+        self._flush_lock = asyncio.Lock()
+        self.stats = {
+            "messages": 0, "duplicates": 0, "parsed": 0, "failed": 0,
+            "created": 0, "updated": 0, "unchanged": 0, "bytes_saved": 0,
+        }
+
+    async def process(self, message_id: Optional[str], text: str, digest: str):
+        email_text, bytes_saved = text, 0
+        if get_settings().EMAIL_PREPROCESSING_ENABLED:
+            email_text, bytes_saved = strip_email_noise(text)
+        self.stats["bytes_saved"] += bytes_saved
+
+        orders, errors = await parse_email_with_gemini(email_text)
+        if errors:
+            print(f"[!] {message_id or digest[:12]}: {'; '.join(errors)}")
+        # API errors are transient: leave the message un-checkpointed so it is retried
+        if not orders and any(e.startswith("Gemini API Error") for e in errors):
+            self.stats["failed"] += 1
+            return
+
+        self.stats["parsed"] += 1
+        self.pending_orders.extend(orders)
+        self.pending_entries.append((message_id, digest))
+        if len(self.pending_orders) >= self.batch_size or len(self.pending_entries) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            orders, self.pending_orders = self.pending_orders, []
+            entries, self.pending_entries = self.pending_entries, []
+            if orders:
+                for _, outcome in await db.add_many(orders):
+                    self.stats[outcome.value] += 1
+            if entries:
+                self.checkpoint.commit(entries)
+                print(f"[OK] Stored {len(orders)} order(s) from {len(entries)} message(s)")
+
+
+async def worker(queue: asyncio.Queue, ingestor: Ingestor):
+    while True:
+        item = await queue.get()
+        try:
+            if item is None:
+                return
+            await ingestor.process(*item)
+        except Exception as e:
+            ingestor.stats["failed"] += 1
+            print(f"[X] Failed to ingest message: {e}")
+        finally:
+            queue.task_done()
+
+
+async def ingest(path: str, fmt: str, checkpoint_path: str, batch_size: int, concurrency: int):
+    configure_db(get_settings())
+
+    checkpoint = Checkpoint(checkpoint_path)
+    ingestor = Ingestor(checkpoint, batch_size)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    workers = [asyncio.create_task(worker(queue, ingestor)) for _ in range(concurrency)]
+
+    print(f"Ingesting from {path} with {concurrency} worker(s); "
+          f"{len(checkpoint.hashes)} message(s) already checkpointed")
+
+    box = open_mailbox(path, fmt)
+    try:
+        for message_id, text in iter_messages(box):
+            ingestor.stats["messages"] += 1
+            digest = content_hash(text)
+            if checkpoint.seen(message_id, digest):
+                ingestor.stats["duplicates"] += 1
+                continue
+            checkpoint.mark(message_id, digest)
+            await queue.put((message_id, text, digest))
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        await ingestor.flush()
+        box.close()
+
+    print("\n" + "=" * 50)
+    for key, value in ingestor.stats.items():
+        print(f"  {key}: {value}")
+    print("=" * 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest supplier emails from a Maildir or mbox.")
+    parser.add_argument("path", help="Path to a Maildir directory or mbox file")
+    parser.add_argument("--format", choices=["auto", "maildir", "mbox"], default="auto")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.ingest-checkpoint.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Orders per batched upsert")
+    parser.add_argument(
+        "--concurrency", type=int, default=rate_limiter.capacity,
+        help="Parse workers (default: rate limiter burst capacity, enough to keep it saturated)",
+    )
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or os.path.abspath(args.path).rstrip(os.sep) + ".ingest-checkpoint.jsonl"
+    asyncio.run(ingest(args.path, args.format, checkpoint_path, args.batch_size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
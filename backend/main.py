@@ -1,26 +1,52 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.routes import orders
 from app.core.config import get_settings
-from app.services.db import db
+from app.core.tracing import tracing_middleware
+from app.services.db import db, configure_db
+from app.services.gemini_service import get_client, hedge_metrics, rate_limiter, shutdown_decode_pool
+from app.services.maintenance import maintenance_loop
 
 settings = get_settings()
 
 
+async def warm_up():
+    """
+    Connect the database and create the Gemini client in the background.
+    Both imports are heavy; running them in worker threads after startup lets
+    the server accept /health immediately. A request that arrives before the
+    warm-up finishes simply creates the client itself on first use.
+    """
+    async def warm_db():
+        await asyncio.to_thread(db.connect)
+        # Open pooled connections before the first real query (count set by the backend's configuration)
+        await asyncio.to_thread(db.prewarm)
+
+    try:
+        await asyncio.gather(warm_db(), asyncio.to_thread(get_client))
+    except Exception as e:
+        print(f"Background warm-up failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Application lifespan manager.
-    Initializes Supabase client on startup and cleans up on shutdown.
+    Configures the database on startup (connected lazily / warmed in the
+    background) and cleans up on shutdown.
     """
-    # Startup: Initialize Supabase client
-    db.connect(
-        supabase_url=settings.NEXT_PUBLIC_SUPABASE_URL,
-        supabase_key=settings.SUPABASE_SERVICE_ROLE_KEY,
-    )
+    # Startup: store credentials only, connect in the background
+    configure_db(settings)
+    warm_up_task = asyncio.create_task(warm_up())
+    maintenance_task = asyncio.create_task(maintenance_loop(settings))
     yield
     # Shutdown: Cleanup
+    warm_up_task.cancel()
+    maintenance_task.cancel()
+    shutdown_decode_pool()
     db.disconnect()
 
 
@@ -33,8 +59,15 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profiled-Status", "X-Write-Outcome", "Retry-After"],
 )
 
+# Compress responses above the threshold (large order lists)
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+
+# Per-request latency breakdown (Server-Timing) and on-demand profiling
+app.middleware("http")(tracing_middleware)
+
 app.include_router(orders.router, prefix="/api")
 
 
@@ -45,10 +78,23 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """Health check endpoint - verifies API and Supabase connectivity."""
+    """Health check endpoint - verifies API and database connectivity."""
+    if not db.is_connected:
+        # Still warming up in the background; the API itself is serving
+        return {"status": "starting", "database": "connecting"}
     try:
-        # Quick DB check - try to fetch from table
-        db.client.table('purchase_orders').select('po_id').limit(1).execute()
+        # Quick DB check - lightweight round trip
+        await asyncio.to_thread(db.ping)
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         return {"status": "unhealthy", "database": str(e)}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics for tuning: Gemini request hedging and the database pool."""
+    return {
+        "gemini": hedge_metrics.snapshot(),
+        "rate_limiter": rate_limiter.snapshot(),
+        "db_pool": db.pool_stats(),
+    }
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { PurchaseOrder, OrderStatus } from "@/types";
 import { api } from "@/lib/api";
 import { toast } from "sonner";
@@ -7,12 +7,24 @@ export function useOrders() {
     const [orders, setOrders] = useState<PurchaseOrder[]>([]);
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
+    // Delta sync position; only changes since this cursor are downloaded
+    const cursorRef = useRef<string | undefined>(undefined);
 
     const fetchOrders = useCallback(async () => {
         try {
             setIsLoading(true);
-            const data = await api.orders.list();
-            setOrders(data);
+            const { orders: changed, deleted, cursor, reset } = await api.orders.changes(cursorRef.current);
+            if (reset) {
+                setOrders(changed);
+            } else if (changed.length || deleted.length) {
+                // Changes arrive oldest first; the list is kept newest first
+                const replaced = new Set([...deleted, ...changed.map((o) => o.id)]);
+                setOrders((current) => [
+                    ...[...changed].reverse(),
+                    ...current.filter((o) => !replaced.has(o.id)),
+                ]);
+            }
+            cursorRef.current = cursor;
             setError(null);
         } catch (err) {
             const msg = "Failed to fetch orders";
@@ -1,4 +1,4 @@
-import { PurchaseOrder, OrderStatus, EmailParsingResponse } from "@/types";
+import { PurchaseOrder, OrderStatus, EmailParsingResponse, OrderChangesResponse } from "@/types";
 
 // Use env var or default to relative path for Vercel (proxied), fallback to LAN IP for local
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "/api";
@@ -23,6 +23,13 @@ export const api = {
             return handleResponse<PurchaseOrder[]>(res);
         },
 
+        // Orders written and deleted since the cursor (full snapshot without one)
+        changes: async (since?: string): Promise<OrderChangesResponse> => {
+            const query = since ? `?since=${encodeURIComponent(since)}` : "";
+            const res = await fetch(`${API_BASE_URL}/orders/changes${query}`);
+            return handleResponse<OrderChangesResponse>(res);
+        },
+
         create: async (order: PurchaseOrder): Promise<PurchaseOrder> => {
             const res = await fetch(`${API_BASE_URL}/orders`, {
                 method: "POST",
@@ -14,8 +14,16 @@ export interface EmailParsingRequest {
   email_text: string;
 }
 
+export interface OrderChangesResponse {
+  orders: PurchaseOrder[];
+  deleted: string[];
+  cursor: string;
+  reset: boolean;
+}
+
 export interface EmailParsingResponse {
   parsed_data: PurchaseOrder[];
   errors: string[];
   existing_ids: string[];
+  bytes_saved?: number;
 }
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+
+from app.schemas import PurchaseOrder, OrderStatus  # noqa: E402
+
+ORDERS = 500
+RUNS = 50
+PREFIX = "BENCH-"  # Only rows with this prefix are written and cleaned up
+
+STATUSES = list(OrderStatus)
+
+
+def make_orders(count):
+    return [
+        PurchaseOrder(
+            id=f"{PREFIX}{10000 + i}",
+            supplier=f"Supplier {i % 37} Manufacturing Co.",
+            items=f"{(i % 9 + 1) * 25}x Widget {chr(65 + i % 26)}, {(i % 5 + 1) * 10}x Gadget {i % 13}",
+            expected_date=f"Jan {i % 28 + 1:02d}, 2025",
+            status=STATUSES[i % len(STATUSES)],
+        )
+        for i in range(count)
+    ]
+
+
+async def timed(fn, runs):
+    """Median and p95 latency of 'runs' sequential calls, in milliseconds."""
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+async def run_workload(db):
+    """The same operations, in the same order, for every backend."""
+    orders = make_orders(ORDERS)
+    ids = [order.id for order in orders]
+    await db.delete_many(ids)  # Leftovers from an interrupted run
+
+    results = {}
+    start = time.perf_counter()
+    outcomes = await db.add_many(orders)
+    results["add_many"] = ((time.perf_counter() - start) * 1000,) * 2
+    if len(outcomes) != ORDERS:
+        raise RuntimeError(f"add_many returned {len(outcomes)} outcomes, expected {ORDERS}")
+
+    results["get_all"] = await timed(lambda i: db.get_all(), RUNS)
+    results["get_by_id"] = await timed(lambda i: db.get_by_id(ids[i * 7 % ORDERS]), RUNS)
+    results["search_items"] = await timed(lambda i: db.search_items(f"Widget {chr(65 + i % 26)}"), RUNS)
+    results["update_status"] = await timed(
+        lambda i: db.update_status(ids[i * 11 % ORDERS], STATUSES[i % len(STATUSES)]), RUNS
+    )
+    results["add"] = await timed(lambda i: db.add(orders[i * 13 % ORDERS]), RUNS)
+    results["delete"] = await timed(lambda i: db.delete(ids[i]), RUNS)
+
+    start = time.perf_counter()
+    await db.delete_many(ids)
+    results["delete_many"] = ((time.perf_counter() - start) * 1000,) * 2
+    return results
+
+
+async def bench_sqlite():
+    from app.services.db_sqlite import SqliteDB
+    db = SqliteDB()
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "bench.db"), readers=4)
+        db.connect()
+        try:
+            return await run_workload(db)
+        finally:
+            db.disconnect()
+
+
+async def bench_postgres():
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        return "skipped (set DATABASE_URL, schema from backend/database/schema.sql)"
+    from app.services.db_postgres import PostgresDB
+    db = PostgresDB()
+    await db.connect(url)
+    try:
+        return await run_workload(db)
+    finally:
+        await db.disconnect()
+
+
+async def bench_supabase():
+    url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        return "skipped (set NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY)"
+    from app.services.db_supabase import SupabaseDB
+    db = SupabaseDB()
+    db.configure(url, key)
+    await asyncio.to_thread(db.connect)
+    try:
+        return await run_workload(db)
+    finally:
+        db.disconnect()
+
+
+async def bench_db_backends():
+    backends = {}
+    for name, bench in (("sqlite", bench_sqlite), ("postgres", bench_postgres), ("supabase", bench_supabase)):
+        try:
+            backends[name] = await bench()
+        except Exception as e:
+            backends[name] = f"failed: {e}"
+
+    measured = {name: r for name, r in backends.items() if isinstance(r, dict)}
+    print("=" * 72)
+    print(f"{ORDERS} orders, {RUNS} sequential calls per operation, median / p95 in ms")
+    print("(add_many and delete_many are single calls over all orders)")
+    print("-" * 72)
+    print(f"{'operation':<15}" + "".join(f"{name:>19}" for name in measured))
+    for op in next(iter(measured.values()), {}):
+        cells = "".join(f"{r[op][0]:>9.2f} / {r[op][1]:>7.2f}" for r in measured.values())
+        print(f"{op:<15}{cells}")
+    print("=" * 72)
+    for name, result in backends.items():
+        if not isinstance(result, dict):
+            print(f"{name}: {result}")
+
+    if "sqlite" not in measured:
+        print("\nFAILURE: SQLite backend did not complete the workload.")
+        exit(1)
+    exit(0)
+
+
+if __name__ == "__main__":
+    asyncio.run(bench_db_backends())
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BACKEND_DIR)
+
+# Settings are required at import time; nothing here talks to Gemini or Supabase
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+os.environ.setdefault("NEXT_PUBLIC_SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench.service.key")
+
+from app.core.config import get_settings  # noqa: E402
+from app.services import gemini_service  # noqa: E402
+
+ORDERS = 500
+RUNS = 10
+TICK_S = 0.001          # Lag probe interval
+MODEL_LATENCY_S = 0.05  # Simulated Gemini round trip
+
+STATUSES = ["On Track", "Product Delays", "Shipped", "Shipment Delay"]
+
+
+def fake_response_text(count):
+    orders = [
+        {
+            "id": f"PO-{10000 + i}",
+            "supplier": f"Supplier {i % 37} Manufacturing Co.",
+            "items": f"{(i % 9 + 1) * 25}x Widget {chr(65 + i % 26)}, {(i % 5 + 1) * 10}x Gadget {i % 13}",
+            "expected_date": f"Jan {i % 28 + 1:02d}, 2025",
+            "status": STATUSES[i % len(STATUSES)],
+            "last_updated": "Dec 01, 2024",
+            "additional_context": None if i % 3 else f"Partial shipment, remaining {i % 50}% by Feb {i % 28 + 1}",
+        }
+        for i in range(count)
+    ]
+    return "```json\n" + json.dumps(orders, indent=2) + "\n```"
+
+
+class FakeModels:
+    def __init__(self, text):
+        self.text = text
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(MODEL_LATENCY_S)
+        return SimpleNamespace(text=self.text)
+
+
+async def probe_lag(samples, stop):
+    """Sleep in short ticks and record how late each wake-up is."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        samples.append(time.perf_counter() - start - TICK_S)
+
+
+async def measure_parse(large_response_bytes, use_pool):
+    get_settings().PARSE_LARGE_RESPONSE_BYTES = large_response_bytes
+    gemini_service.decode_pool_enabled = lambda: use_pool
+    samples = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(samples, stop))
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    orders, errors = await gemini_service.parse_email_with_gemini("bench email")
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+    if errors or len(orders) != ORDERS:
+        raise RuntimeError(f"Unexpected parse result: {len(orders)} orders, errors={errors[:3]}")
+    return max(samples) * 1000, sum(samples) * 1000, elapsed * 1000, orders
+
+
+async def bench_mode(label, large_response_bytes, use_pool):
+    results = [await measure_parse(large_response_bytes, use_pool) for _ in range(RUNS)]
+    max_lag = statistics.median(r[0] for r in results)
+    stalled = statistics.median(r[1] for r in results)
+    total = statistics.median(r[2] for r in results)
+    print(f"{label:<8} {max_lag:12.2f} ms {stalled:12.2f} ms {total:12.2f} ms")
+    return max_lag, results[0][3]
+
+
+async def bench_event_loop_lag():
+    text = fake_response_text(ORDERS)
+    client = SimpleNamespace(aio=SimpleNamespace(models=FakeModels(text)))
+    gemini_service.get_client = lambda: client
+    gemini_service.rate_limiter = gemini_service.TokenBucket(capacity=1000, refill_rate=1000)
+    cpus = os.cpu_count() or 1
+
+    print("=" * 60)
+    print(f"Parsing a {ORDERS}-order response ({len(text) / 1024:.0f} KiB) on {cpus} CPU(s), "
+          f"{get_settings().PARSE_PROCESS_POOL_WORKERS} pool worker(s)")
+    print(f"Median of {RUNS} runs")
+    print("-" * 60)
+    print(f"{'mode':<8} {'max loop lag':>15} {'total stall':>15} {'parse time':>15}")
+
+    # Before: decode + validate in one block on the event loop
+    inline_lag, inline_orders = await bench_mode("inline", 0, use_pool=False)
+    # After: validate in batches; decode inline (pool disabled / single CPU)
+    batched_lag, batched_orders = await bench_mode("batched", 1, use_pool=False)
+    # After: validate in batches; decode in the process pool
+    await measure_parse(1, use_pool=True)  # start the pool workers outside the measurement
+    pooled_lag, pooled_orders = await bench_mode("pooled", 1, use_pool=True)
+    gemini_service.shutdown_decode_pool()
+    print("=" * 60)
+
+    if cpus < 2:
+        print("\nNOTE: Single CPU - pool workers compete with the event loop, so the server")
+        print("      skips the pool here (decode_pool_enabled). Run on a multi-core host")
+        print("      to measure the pooled decode.")
+
+    expected = [o.model_dump() for o in inline_orders]
+    if any([o.model_dump() for o in orders] != expected for orders in (batched_orders, pooled_orders)):
+        print("\nFAILURE: Batched/pooled parse returned different orders than inline parse.")
+        exit(1)
+    best = min(batched_lag, pooled_lag if cpus > 1 else batched_lag)
+    print(f"\nMax event-loop lag: {inline_lag:.2f} ms inline -> {best:.2f} ms")
+    exit(0)
+
+
+if __name__ == "__main__":
+    asyncio.run(bench_event_loop_lag())
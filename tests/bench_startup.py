@@ -0,0 +1,88 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+
+# Regression budgets (milliseconds)
+MAX_IMPORT_MS = 1500
+MAX_FIRST_REQUEST_MS = 3000
+RUNS = 3
+
+# Settings are required at import time; dummy values are enough because
+# nothing connects until first use. Real values from the environment win.
+BENCH_ENV = {
+    "GEMINI_API_KEY": "bench-key",
+    "NEXT_PUBLIC_SUPABASE_URL": "https://bench.supabase.co",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench.service.key",
+    **os.environ,
+}
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import main; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def measure_import_ms():
+    """Time `import main` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=BENCH_ENV, capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_request_ms(timeout=30):
+    """Time from process spawn until /health returns its first response."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=BENCH_ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                return (time.perf_counter() - start) * 1000
+            except requests.ConnectionError:
+                time.sleep(0.01)
+        raise TimeoutError(f"Server did not answer /health within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def bench_startup():
+    import_times = [measure_import_ms() for _ in range(RUNS)]
+    first_request_times = [measure_first_request_ms() for _ in range(RUNS)]
+
+    import_ms = min(import_times)
+    first_request_ms = min(first_request_times)
+
+    print("=" * 50)
+    print(f"Import time (best of {RUNS}):           {import_ms:8.1f} ms  (budget {MAX_IMPORT_MS} ms)")
+    print(f"Time to first request (best of {RUNS}): {first_request_ms:8.1f} ms  (budget {MAX_FIRST_REQUEST_MS} ms)")
+    print("=" * 50)
+
+    if import_ms > MAX_IMPORT_MS or first_request_ms > MAX_FIRST_REQUEST_MS:
+        print("\nWARNING: Startup time regressed past budget.")
+        exit(1)
+    else:
+        print("\nSUCCESS: Startup within budget!")
+        exit(0)
+
+
+if __name__ == "__main__":
+    bench_startup()
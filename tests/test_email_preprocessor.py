@@ -0,0 +1,77 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.email_preprocessor import strip_email_noise  # noqa: E402
+
+MULTI_EMAIL_PASTE = """Hi team,
+
+PO-100 from Acme is on track for Jan 15.
+
+--
+Jane Doe
+Acme Logistics | +1 555 0100
+
+Hello,
+
+PO-200 is delayed by two weeks due to a port closure.
+
+Thanks,
+Bob
+"""
+
+FORWARDED = """FYI, see below.
+
+---------- Forwarded message ---------
+From: Globex Supply <orders@globex.example>
+Date: Mon, Jan 6, 2025 at 9:14 AM
+Subject: PO-300 shipped
+To: buyer@example.com
+
+The order left our warehouse this morning.
+"""
+
+
+def test_signature_does_not_swallow_next_email():
+    cleaned, _ = strip_email_noise(MULTI_EMAIL_PASTE)
+    assert "PO-100" in cleaned
+    assert "PO-200 is delayed" in cleaned
+    assert "Jane Doe" not in cleaned
+
+
+def test_signature_mentioning_new_po_is_kept():
+    email = "PO-100 is on track.\n\n--\nJane Doe\nRe: PO-999 replacement parts\n"
+    cleaned, _ = strip_email_noise(email)
+    assert "PO-999" in cleaned
+
+
+def test_forward_keeps_sender_and_subject():
+    cleaned, _ = strip_email_noise(FORWARDED)
+    assert "From: Globex Supply" in cleaned
+    assert "Subject: PO-300 shipped" in cleaned
+    assert "Date:" not in cleaned
+    assert "To: buyer@example.com" not in cleaned
+    assert "left our warehouse" in cleaned
+
+
+def test_redundant_quoted_history_is_dropped():
+    email = "PO-100 shipped today.\n\nOn Mon, Jan 6, 2025 at 9:14 AM Bob wrote:\n> > PO-100 status?\n"
+    cleaned, saved = strip_email_noise(email)
+    assert cleaned == "PO-100 shipped today."
+    assert saved > 0
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    failures = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"PASS {name}")
+        except AssertionError:
+            failures += 1
+            print(f"FAIL {name}")
+    print(f"\nResults: {len(tests) - failures}/{len(tests)} Passed")
+    exit(1 if failures else 0)